@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+
+'''
+Candidate placer benchmark (cpbench)
+
+Generates reproducible random scenarios over a grid of sizes and runs the
+cplacer solver engines on them, reports wall time, placements evaluated
+per second, peak memory and whether the N best dissapointments match the
+reference engine (heuristic engines may only be worse). Machine readable
+results are written as JSON. The start up of the cplacer.py command line
+is measured too and checked against a fixed budget (--grid "" measures the
+start up only).
+
+  ./cpbench.py --grid 4x6,8x10,16x20 --engines bruteforce,assignment,bnb \
+               --solve-cnt 3 --json bench.json
+'''
+import os
+import sys
+import time
+import random
+import optparse
+
+import cplacer
+
+# ---------------------------------------------------------------------------
+# scenario generator
+# ---------------------------------------------------------------------------
+
+def generate_scenario(in_seed, in_team_cnt, in_cand_cnt, in_wishlist_len = 3,
+                      in_decision_ratio = 0.0, in_contention = 0.5):
+  '''
+  Random configuration (data dict as used by cplacer.main()), the same
+  parameters give the same scenario.
+
+  in_decision_ratio is the fraction of teams with a decision, in_contention
+  (0.0 - 1.0) narrows the pool the wishlists are drawn from, 1.0 ~ all
+  teams want the same few candidates.
+  '''
+  r = random.Random(in_seed);
+  pool_cnt = max(in_wishlist_len, int(round(in_cand_cnt * (1.0 - in_contention))), 1);
+  pool_cnt = min(pool_cnt, in_cand_cnt);
+  lteams = [ ];
+  for i_t in xrange(in_team_cnt):
+    lteams.append(cplacer.Team("t%d~%d" % (i_t, r.randint(1, 5))));
+  lcands = [ ];
+  for i_c in xrange(in_cand_cnt):
+    lcands.append(cplacer.Candidate("c%d" % i_c));
+  lreqs = [ ];
+  for i_t in xrange(in_team_cnt):
+    # wishlist mostly from the contended pool, rest from everybody
+    lwish = [ ];
+    while (len(lwish) < min(in_wishlist_len, in_cand_cnt)):
+      if (r.random() < in_contention):
+        c = r.randrange(pool_cnt);
+      else:
+        c = r.randrange(in_cand_cnt);
+      if (c not in lwish):
+        lwish.append(c);
+    for indx in xrange(len(lwish)):
+      lreqs.append(cplacer.Requirement("t%d~c%d~%d" % (i_t, lwish[indx], indx + 1)));
+  ldecs = [ ];
+  lfree = range(in_cand_cnt);
+  r.shuffle(lfree);
+  for i_t in r.sample(xrange(in_team_cnt), int(in_team_cnt * in_decision_ratio)):
+    if (len(lfree) == 0):
+      break;
+    ldecs.append(cplacer.Decision("t%d~c%d" % (i_t, lfree.pop())));
+  data = cplacer.new_data();
+  cplacer.add_objects(data, lteams, lcands, lreqs, ldecs);
+  return(data);
+
+def get_space_size(in_data, in_reduce_ena = False):
+  # brute-force search space of the scenario (product of the option counts)
+  p = cplacer.Problem(in_data, in_reduce_ena);
+  ret_val = 1;
+  for i_s in xrange(p.seat_cnt):
+    ret_val *= len(p.get_options(i_s));
+  return(ret_val);
+
+# ---------------------------------------------------------------------------
+# engine runs
+# ---------------------------------------------------------------------------
+
+def get_peak_memory():
+  # peak resident set size of this process in kB
+  import resource;
+  ret_val = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;
+  if (sys.platform == 'darwin'):
+    # bytes on Mac OS X
+    ret_val /= 1024;
+  return(ret_val);
+
+def run_engine(in_data, in_engine, in_solve_cnt, in_presolve = False):
+  # solve in_data by in_engine, returns dict of the run measurements
+  engine = cplacer.SOLVER_ENGINES[in_engine];
+  t = time.time();
+  if ((in_presolve) and (engine.presolve)):
+    solver = cplacer.PresolveSolver(in_data = in_data, in_best_option_cnt = in_solve_cnt,
+                                    in_engine = engine);
+  else:
+    solver = engine(in_data = in_data, in_best_option_cnt = in_solve_cnt);
+  solver.init();
+  # the placements as solve() yields them
+  results = [(i_p.dissapointment, i_p.choice) for i_p in cplacer.iter_placements(in_data, solver)];
+  wall = time.time() - t;
+  ret_val = { };
+  ret_val['wall_s'] = wall;
+  ret_val['evaluated'] = solver.eval_cnt;
+  ret_val['placements_per_s'] = solver.eval_cnt / max(wall, 1e-9);
+  ret_val['scores'] = [i_d for i_d, i_ch in results];
+  ret_val['choices'] = [list(i_ch) for i_d, i_ch in results];
+  ret_val['peak_kb'] = get_peak_memory();
+  return(ret_val);
+
+def _run_child(in_conn, in_args):
+  # forked child process of run_isolated()
+  try:
+    in_conn.send(run_engine(*in_args));
+  except Exception, e:
+    in_conn.send({ 'error' : str(e) });
+  in_conn.close();
+
+def run_isolated(in_data, in_engine, in_solve_cnt, in_presolve = False, in_timeout = None):
+  '''
+  run_engine() in a separate process, so the peak memory belongs to the
+  single run and a run over in_timeout seconds can be stopped
+  '''
+  import multiprocessing;
+  conn_parent, conn_child = multiprocessing.Pipe(False);
+  p = multiprocessing.Process(target = _run_child,
+                              args = (conn_child, (in_data, in_engine, in_solve_cnt, in_presolve)));
+  p.start();
+  ret_val = None;
+  if (conn_parent.poll(in_timeout)):
+    ret_val = conn_parent.recv();
+  else:
+    p.terminate();
+    ret_val = { 'error' : "timeout" };
+  p.join();
+  return(ret_val);
+
+# ---------------------------------------------------------------------------
+# benchmark
+# ---------------------------------------------------------------------------
+
+def parse_grid(in_str):
+  # "4x6,8x10" -> [(4, 6), (8, 10)] (teams x candidates)
+  ret_val = [ ];
+  for i_g in in_str.split(','):
+    if (i_g.strip() == ''):
+      continue;
+    t, c = i_g.lower().split('x');
+    ret_val.append((int(t), int(c)));
+  return(ret_val);
+
+def run_benchmark(in_opts):
+  '''
+  Run every engine on every grid scenario, returns list of records (dicts)
+  '''
+  lengines = in_opts['engines'].split(',');
+  ret_val = [ ];
+  for i_t, i_c in parse_grid(in_opts['grid']):
+    for i_r in xrange(in_opts['scenarios']):
+      seed = in_opts['seed'] + i_r;
+      data = generate_scenario(seed, i_t, i_c, in_opts['wishlist'],
+                               in_opts['decision_ratio'], in_opts['contention']);
+      space = get_space_size(data);
+      lrecords = [ ];
+      for i_e in lengines:
+        rec = { 'teams' : i_t, 'candidates' : i_c, 'seed' : seed, 'engine' : i_e,
+                'wishlist' : in_opts['wishlist'], 'decision_ratio' : in_opts['decision_ratio'],
+                'contention' : in_opts['contention'], 'solve_cnt' : in_opts['solve_cnt'],
+                'presolve' : in_opts['presolve'], 'space' : space,
+                'exact' : cplacer.SOLVER_ENGINES[i_e].exact };
+        if ( (i_e in ['bruteforce', 'batch']) and (not in_opts['presolve']) and \
+             (space > in_opts['max_space']) ):
+          rec['error'] = "skipped, search space over --max-space";
+        else:
+          lruns = [ ];
+          for i_i in xrange(in_opts['repeat']):
+            lruns.append(run_isolated(data, i_e, in_opts['solve_cnt'],
+                                      in_opts['presolve'], in_opts['timeout']));
+          lok = [i_run for i_run in lruns if ('error' not in i_run)];
+          if (len(lok) == 0):
+            rec['error'] = lruns[0]['error'];
+          else:
+            # best of the repeated runs
+            lok.sort(key = lambda i_run: i_run['wall_s']);
+            rec.update(lok[0]);
+            rec['peak_kb'] = max([i_run['peak_kb'] for i_run in lok]);
+            rec['invalid'] = check_placements(data, rec);
+        lrecords.append(rec);
+      # check the N best dissapointments against the reference engine
+      lref = [i_rec for i_rec in lrecords if ((i_rec['engine'] == in_opts['reference']) and ('scores' in i_rec))];
+      if (len(lref) == 0):
+        lref = [i_rec for i_rec in lrecords if ('scores' in i_rec)];
+      # (the common leading ones - a heuristic engine, the stable one
+      # especially, may return fewer placements, reported as count_diff)
+      for i_rec in lrecords:
+        i_rec['match'] = None;
+        if ((len(lref) > 0) and ('scores' in i_rec)):
+          lscores = lref[0]['scores'];
+          cnt = min(len(i_rec['scores']), len(lscores));
+          i_rec['count_diff'] = len(i_rec['scores']) - len(lscores);
+          i_rec['match'] = (i_rec['scores'][:cnt] == lscores[:cnt]);
+          if (i_rec['exact']):
+            # the same placements, ties included
+            i_rec['match'] = ((i_rec['match']) and (i_rec['count_diff'] == 0) and \
+                              (i_rec['choices'] == lref[0]['choices']));
+        print_record(i_rec);
+      ret_val.extend(lrecords);
+  return(ret_val);
+
+def check_placements(in_data, in_rec):
+  '''
+  Error message when the placements of in_rec repeat or their scores are
+  not the dissapointments of their choices, None when all right
+  '''
+  p = cplacer.Problem(in_data);
+  lseen = set();
+  for i_d, i_ch in zip(in_rec['scores'], in_rec['choices']):
+    if (tuple(i_ch) in lseen):
+      return("placement %s repeated" % i_ch);
+    lseen.add(tuple(i_ch));
+    d = 0.0;
+    for i_s in xrange(p.seat_cnt):
+      lopt = p.get_options(i_s);
+      if (i_ch[i_s] not in lopt):
+        return("placement %s takes an invalid option" % i_ch);
+      d += p.get_costs(i_s)[lopt.index(i_ch[i_s])];
+    if (abs(d - i_d) > 1e-6):
+      return("placement %s scored %.1f instead of %.1f" % (i_ch, i_d, d));
+  return(None);
+
+def print_record(in_rec):
+  int_str = "%4d x %-4d seed:%-4d %-11s " % (in_rec['teams'], in_rec['candidates'],
+                                            in_rec['seed'], in_rec['engine']);
+  if ('error' in in_rec):
+    print int_str + in_rec['error'];
+    return;
+  match = { True : 'ok', False : 'MISMATCH', None : '?' }[in_rec['match']];
+  if ((in_rec['match'] == False) and (not in_rec['exact'])):
+    # heuristic engine may miss the best placements
+    match = 'worse';
+  if (in_rec.get('count_diff', 0) != 0):
+    match += " (%+d placements)" % in_rec['count_diff'];
+  if (in_rec.get('invalid', None) != None):
+    match = "INVALID %s" % in_rec['invalid'];
+  print int_str + "%9.3f s %12.0f pl/s %8d kB best:%-8.1f %s" % \
+    (in_rec['wall_s'], in_rec['placements_per_s'], in_rec['peak_kb'],
+     (in_rec['scores'] or [float('nan')])[0], match);
+
+# ---------------------------------------------------------------------------
+# command line start up
+# ---------------------------------------------------------------------------
+
+def measure_startup(in_repeat, in_budget_ms):
+  '''
+  Wall time of cplacer.py command lines run in a new interpreter (the
+  fastest of in_repeat runs) on a small saved scenario, returns list of
+  records (dicts)
+  '''
+  import subprocess;
+  import tempfile;
+  script = os.path.join(os.path.dirname(os.path.abspath(cplacer.__file__)), 'cplacer.py');
+  fd, fn = tempfile.mkstemp(suffix = '.cpd');
+  os.close(fd);
+  cplacer.save_data(generate_scenario(1, 4, 6), fn);
+  lcommands = [('list', ['--load-data', fn, '-L']),
+               ('solve', ['--load-data', fn, '-s', '--engine', 'assignment'])];
+  ret_val = [ ];
+  devnull = open(os.devnull, 'w');
+  try:
+    for i_name, i_args in lcommands:
+      lwall = [ ];
+      for i_i in xrange(in_repeat):
+        t = time.time();
+        subprocess.check_call([sys.executable, script] + i_args, stdout = devnull);
+        lwall.append((time.time() - t) * 1000.0);
+      rec = { 'command' : i_name, 'args' : i_args[2:], 'wall_ms' : min(lwall),
+              'budget_ms' : in_budget_ms };
+      rec['ok'] = (rec['wall_ms'] <= in_budget_ms);
+      print_startup_record(rec);
+      ret_val.append(rec);
+  finally:
+    devnull.close();
+    os.remove(fn);
+  return(ret_val);
+
+def print_startup_record(in_rec):
+  status = 'ok';
+  if (not in_rec['ok']):
+    status = 'OVER BUDGET';
+  print "startup %-8s %9.1f ms (budget %.0f ms) %s" % (in_rec['command'], in_rec['wall_ms'],
+                                                      in_rec['budget_ms'], status);
+
+def main(in_opts):
+  import json;
+  import platform;
+  records = [ ];
+  if (len(parse_grid(in_opts['grid'])) > 0):
+    print "%-12s%-10s%-12s%11s %17s %11s" % ("teams x cand", "", "engine", "wall", "speed", "peak memory");
+    records = run_benchmark(in_opts);
+  lstartup = [ ];
+  if (in_opts['startup_budget'] > 0):
+    lstartup = measure_startup(in_opts['startup_repeat'], in_opts['startup_budget']);
+  if (in_opts['json'] != None):
+    out = { };
+    out['created'] = time.strftime("%Y-%m-%dT%H:%M:%S");
+    out['python'] = platform.python_version();
+    out['platform'] = platform.platform();
+    out['options'] = in_opts;
+    out['records'] = records;
+    out['startup'] = lstartup;
+    fh = open(in_opts['json'], 'w');
+    json.dump(out, fh, indent = 1, sort_keys = True);
+    fh.close();
+  lbad = [i_rec for i_rec in records if ((i_rec['match'] == False) and (i_rec['exact']))];
+  if (len(lbad) > 0):
+    print "%d run[s] do not match the reference engine" % len(lbad);
+    return(1);
+  linvalid = [i_rec for i_rec in records if (i_rec.get('invalid', None) != None)];
+  if (len(linvalid) > 0):
+    print "%d run[s] with invalid placements" % len(linvalid);
+    return(1);
+  lslow = [i_rec for i_rec in lstartup if (not i_rec['ok'])];
+  if (len(lslow) > 0):
+    print "%d command line[s] over the start up budget" % len(lslow);
+    return(1);
+  return(0);
+
+
+# main() call
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+
+  usage_msg = "usage: %prog [options]";
+  op = optparse.OptionParser(usage=usage_msg);
+
+  op.add_option("--grid", dest="grid", type="string",
+                action="store", default="4x6,6x8,8x10,12x16,30x40",
+                help="Scenario sizes <teams>x<candidates>,... (def: %default)");
+  op.add_option("--engines", dest="engines", type="string",
+                action="store", default=",".join(sorted(cplacer.SOLVER_ENGINES.keys())),
+                help="Solver engines to run (def: %default)");
+  op.add_option("--reference", dest="reference", type="string",
+                action="store", default="assignment",
+                help="Engine the other ones are checked against (def: %default)");
+  op.add_option("--scenarios", dest="scenarios", type="int",
+                action="store", default=1, metavar="N",
+                help="Scenarios (seeds) per size (def: %default)");
+  op.add_option("--seed", dest="seed", type="int",
+                action="store", default=1,
+                help="First scenario seed (def: %default)");
+  op.add_option("--wishlist", dest="wishlist", type="int",
+                action="store", default=3, metavar="N",
+                help="Wishlist length of every team (def: %default)");
+  op.add_option("--decision-ratio", dest="decision_ratio", type="float",
+                action="store", default=0.1, metavar="R",
+                help="Fraction of teams with a decision (def: %default)");
+  op.add_option("--contention", dest="contention", type="float",
+                action="store", default=0.5, metavar="R",
+                help="0.0 - 1.0, how much the teams want the same candidates (def: %default)");
+  op.add_option("--solve-cnt", dest="solve_cnt", type="int",
+                action="store", default=1, metavar="N",
+                help="N best placements to search for (def: %default)");
+  op.add_option("--presolve", dest="presolve",
+                action="store_true", default=False,
+                help="Run the engines behind the presolve stage (def: %default)");
+  op.add_option("--repeat", dest="repeat", type="int",
+                action="store", default=1, metavar="N",
+                help="Runs of every engine, the fastest one is reported (def: %default)");
+  op.add_option("--max-space", dest="max_space", type="int",
+                action="store", default=10**6, metavar="N",
+                help="Skip enumerating engines over larger search space (def: %default)");
+  op.add_option("--timeout", dest="timeout", type="float",
+                action="store", default=300.0, metavar="SEC",
+                help="Stop a run after SEC seconds (def: %default)");
+  op.add_option("--startup-budget", dest="startup_budget", type="float",
+                action="store", default=200.0, metavar="MS",
+                help="Start up budget of a cplacer.py command line, 0 ~ not measured (def: %default)");
+  op.add_option("--startup-repeat", dest="startup_repeat", type="int",
+                action="store", default=5, metavar="N",
+                help="Runs of every start up command, the fastest one is reported (def: %default)");
+  op.add_option("--json", dest="json", type="string",
+                action="store", default=None, metavar="FILE",
+                help="Write the results as JSON into FILE (def: %default)");
+
+  (opts, args) = op.parse_args();
+
+  int_opts = dict(vars(opts));
+
+  sys.exit(main(int_opts));
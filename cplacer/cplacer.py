@@ -30,20 +30,39 @@ Situation example:
       -R 'tC~Bob~2' -R 'tD~Eve~1' -R 'tA~Eve~2' -R 'tD~Alice~2' -R 'tD~Frank~3' \
       -R 'tC~Frank~1'
 '''
+import os
 import sys
-import pickle
-import optparse
+import time
+import array
+import heapq
+import collections
+import struct
 
 # ---------------------------------------------------------------------------
 # classes
 # ---------------------------------------------------------------------------
 
 # ---------------------------------------------------------------------------
-class Core:
+class Core(object):
+  
+  __slots__ = ('id', 'team', 'candidate', 'name');
   
   def __init__(self):
     self.reset();
   
+  def __getstate__(self):
+    # slots of the whole class hierarchy (no __dict__ to pickle)
+    int_dict = { };
+    for i_c in type(self).__mro__:
+      for i_s in getattr(i_c, '__slots__', ( )):
+        if (hasattr(self, i_s)):
+          int_dict[i_s] = getattr(self, i_s);
+    return(int_dict);
+  
+  def __setstate__(self, in_state):
+    for i_k, i_v in in_state.items():
+      setattr(self, i_k, i_v);
+  
   def reset(self):
     self.id = None;
     self.team = None;
@@ -84,14 +103,20 @@ class Core:
 # ---------------------------------------------------------------------------
 class Decision(Core):
   
+  __slots__ = ( );
+  
   def __init__(self, in_initstr = None):
     self.reset();
     if (in_initstr != None):
       self.init_from_string(in_initstr);
   
   def init_from_string(self, in_str):
-    self.team = in_str.split('~')[0];
-    self.candidate = in_str.split('~')[1];
+    self.init_from_list(in_str.split('~'));
+
+  def init_from_list(self, in_list):
+    # [<team-name>, <cand-name>]
+    self.team = in_list[0];
+    self.candidate = in_list[1];
 
   def __str__(self):
     n, c, t = self._strtuple();
@@ -100,6 +125,8 @@ class Decision(Core):
 # ---------------------------------------------------------------------------
 class Requirement(Core):
   
+  __slots__ = ('priority', );
+  
   def __init__(self, in_initstr = None):
     Core.reset(self);
     self.reset();
@@ -107,9 +134,13 @@ class Requirement(Core):
       self.init_from_string(in_initstr);
   
   def init_from_string(self, in_str):
-    self.team = in_str.split('~')[0];
-    self.candidate = in_str.split('~')[1];
-    self.priority = int(in_str.split('~')[2]);
+    self.init_from_list(in_str.split('~'));
+
+  def init_from_list(self, in_list):
+    # [<team-name>, <cand-name>, <priority>]
+    self.team = in_list[0];
+    self.candidate = in_list[1];
+    self.priority = int(in_list[2]);
   
   def reset(self):
     self.priority = None;
@@ -123,9 +154,42 @@ class Requirement(Core):
     return("R #%02d, name:%s, team:%s, candidate:%s, priority:%s" % (self.id, n, t, c, p));
 
 
+# ---------------------------------------------------------------------------
+class Preference(Core):
+  '''
+  Candidate side wishlist entry - the candidate ranks the team (lower
+  priority ~ preferred)
+  '''
+  __slots__ = ('priority', );
+  
+  def __init__(self, in_initstr = None):
+    Core.reset(self);
+    self.reset();
+    if (in_initstr != None):
+      self.init_from_string(in_initstr);
+  
+  def init_from_string(self, in_str):
+    self.init_from_list(in_str.split('~'));
+
+  def init_from_list(self, in_list):
+    # [<cand-name>, <team-name>, <priority>]
+    self.candidate = in_list[0];
+    self.team = in_list[1];
+    self.priority = int(in_list[2]);
+  
+  def reset(self):
+    self.priority = None;
+
+  def __str__(self):
+    n, c, t = self._strtuple();
+    return("P #%02d, name:%s, candidate:%s, team:%s, priority:%s" % (self.id, n, c, t, self.priority));
+
+
 # ---------------------------------------------------------------------------
 class Candidate(Core):
   
+  __slots__ = ('nick', 'decision', 'requirements', 'preferences');
+  
   def __init__(self, in_initstr = None):
     Core.reset(self);
     self.reset();
@@ -133,14 +197,25 @@ class Candidate(Core):
       self.init_from_string(in_initstr);
   
   def init_from_string(self, in_str):
-    self.name = in_str.split('~')[0];
-    if (len(in_str.split('~'))>1):
-      self.nick = in_str.split('~')[1];
+    self.init_from_list(in_str.split('~'));
+
+  def init_from_list(self, in_list):
+    # [<cand-name>[, <cand-nick>]]
+    self.name = in_list[0];
+    if ((len(in_list)>1) and (in_list[1])):
+      self.nick = in_list[1];
   
   def reset(self):
     self.nick = None;
     self.decision = None;
     self.requirements = [ ];
+    self.preferences = [ ];
+
+  def __setstate__(self, in_state):
+    # older configurations - no preferences
+    Core.__setstate__(self, in_state);
+    if ('preferences' not in in_state):
+      self.preferences = [ ];
 
   def __eq__(self, in_o):
     if (type(self) == type(in_o)):
@@ -153,11 +228,19 @@ class Candidate(Core):
     ni = '?';
     if (self.nick != None):
       ni = str(self.nick);
-    return("C #%02d, name:%s, nick:%s, #requirements:%s, decision:%s" % (self.id, n, ni, self._str_reqs('requirements'), self._str_reqs('decision')));
+    int_str = "C #%02d, name:%s, nick:%s, #requirements:%s, decision:%s" % (self.id, n, ni, self._str_reqs('requirements'), self._str_reqs('decision'));
+    if (len(self.preferences) > 0):
+      int_str += ", preferences:%s" % self._str_reqs('preferences');
+    return(int_str);
 
 
 # ---------------------------------------------------------------------------
 class Team(Core):
+  '''
+  Team with capacity open positions (seats), decided candidates come first
+  in self.candidates, the other ones are selected by the solver
+  '''
+  __slots__ = ('nick', 'priority', 'capacity', 'decisions', 'requirements', 'candidates');
   
   def __init__(self, in_initstr = None):
     Core.reset(self);
@@ -166,53 +249,86 @@ class Team(Core):
       self.init_from_string(in_initstr);
   
   def init_from_string(self, in_str):
-    self.name = in_str.split('~')[0];
-    self.priority = int(in_str.split('~')[1]);
-    if (len(in_str.split('~'))>2):
-      self.nick = in_str.split('~')[2];
+    self.init_from_list(in_str.split('~'));
+
+  def init_from_list(self, in_list):
+    # [<team-name>, <team-priority>[, <team-nick>[, <capacity>]]]
+    self.name = in_list[0];
+    self.priority = int(in_list[1]);
+    if ((len(in_list)>2) and (in_list[2])):
+      self.nick = in_list[2];
+    if ((len(in_list)>3) and (in_list[3])):
+      self.capacity = int(in_list[3]);
+      if (self.capacity < 1):
+        raise ValueError("Team capacity has to be positive");
   
   def reset(self):
     self.nick = None;
     self.priority = None;
-    self.decision = None;
+    self.capacity = 1;
+    self.decisions = [ ];
     self.requirements = [ ];
-    self.candidate = None;
+    self.candidates = [ ];
+
+  def __setstate__(self, in_state):
+    # older configurations - single decision / candidate per team
+    if ('decision' in in_state):
+      in_state = dict(in_state);
+      in_state['decisions'] = [ ];
+      in_state['candidates'] = [ ];
+      if (in_state['decision'] != None):
+        in_state['decisions'].append(in_state['decision']);
+        in_state['candidates'].append(in_state['candidate']);
+      del in_state['decision'];
+      in_state['candidate'] = None;
+      in_state.setdefault('capacity', 1);
+    Core.__setstate__(self, in_state);
+
+  def get_decided(self):
+    # list of decided candidates
+    return([i_d.candidate for i_d in self.decisions]);
 
   def set_decision(self, in_decision):
-    if (self.decision == None):
-      self.candidate = in_decision.candidate;
-      self.decision = in_decision;
+    if (len(self.decisions) < self.capacity):
+      self.decisions.append(in_decision);
+      self.candidates = self.get_decided();
     else:
-      raise Exception("Team.set_decision() failed while another decision in place already!");
+      raise Exception("Team.set_decision() failed while all positions decided already!");
   
-  def reset_decision(self):
-    self.decision = None;
+  def reset_decision(self, in_decision = None):
+    # remove in_decision (all decisions by default) and its candidate
+    if (in_decision == None):
+      self.decisions = [ ];
+    else:
+      self.decisions.remove(in_decision);
+    self.candidates = self.get_decided();
   
   def select_candidate(self, in_cand):
-    if (self.decision == None):
-      self.candidate = in_cand;
+    if (len(self.candidates) < self.capacity):
+      self.candidates.append(in_cand);
     else:
-      raise Exception("Team.select_candidate() failed while decision in place already!");
+      raise Exception("Team.select_candidate() failed while all positions taken already!");
   
   def deselect_candidate (self, in_cand = None):
-    if (self.decision == None):
-      self.candidate = None;
-    else:
+    # deselect in_cand (all not decided candidates by default)
+    if (in_cand == None):
+      self.candidates = self.get_decided();
+    elif (in_cand in self.get_decided()):
       raise Exception("Team.deselect_candidate() failed while decision in place already!");
+    else:
+      self.candidates.remove(in_cand);
 
-  def get_dissapointment(self):
-    team_koef = 1.0 * (100 - self.priority);
-    cand_koef = 10.0; # candidate not selected
-    if (self.candidate != None):
-      cand_koef = 9.0; # candidate selected but not in the requirements
-      for i_r in self.requirements:
-        if (i_r.candidate == self.candidate):
-          cand_koef = (i_r.priority - 1.0);
-          break;
-    
-    # find whether currently selected candidate is on the priority list, if so (prio - 1) else 9.0/10.0
-    ###print "get_dissapointment(): %s (%s)" % ( str(team_koef * cand_koef), self.candidate);
-    return(team_koef * cand_koef);
+  def get_dissapointment(self, in_model = None):
+    # dissapointment of the selected candidates (default ScoringModel)
+    if (in_model == None):
+      in_model = ScoringModel();
+    ret_val = 0.0;
+    for i_s in xrange(self.capacity):
+      cand = None; # candidate not selected
+      if (i_s < len(self.candidates)):
+        cand = self.candidates[i_s];
+      ret_val += in_model.get_cost(self, cand);
+    return(ret_val);
   
   def get_match(self):
     return(self.get_dissapointment());
@@ -221,21 +337,634 @@ class Team(Core):
     int_str = "T #%02d, name:%s" % (self.id, self.name);
     if (self.nick != None):
       int_str += ", nick:%s" % self.nick;
+    if (self.capacity != 1):
+      int_str += ", capacity:%d" % self.capacity;
     if (self.requirements != None):
       int_str += ", requirements:%s" % self._str_reqs('requirements');
-    if (self.decision != None):
-      int_str += ", decision:%s" % self._str_reqs('decision');
-    if (self.candidate != None):
-      int_str += ", candidate:%s(%02d)" % (self.candidate.name, self.candidate.id);
+    lcands = ["%s(%02d)" % (i_c.name, i_c.id) for i_c in self.candidates];
+    if (self.capacity == 1):
+      if (len(self.decisions) > 0):
+        int_str += ", decision:#%02d" % self.decisions[0].id;
+      if (len(lcands) > 0):
+        int_str += ", candidate:%s" % lcands[0];
+    else:
+      if (len(self.decisions) > 0):
+        int_str += ", decisions:%s" % self._str_reqs('decisions');
+      if (len(lcands) > 0):
+        int_str += ", candidates:%s" % ", ".join(lcands);
     
     return(int_str);
 
+# ---------------------------------------------------------------------------
+class ScoringModel(object):
+  '''
+  Placement objective - dissapointment of a team seat taking a candidate
+
+  The model is compiled once into the Problem option cost table (seat x
+  option) all solver engines take their costs from, so a custom model costs
+  nothing extra per evaluated placement. The default one is
+  (100 - team priority) * (requirement priority - 1), with 9 instead of the
+  requirement part for a candidate out of the wishlist and 10 for nobody.
+  Models override get_team_koef() / get_cand_koef() (or get_cost() and
+  get_costs() of a whole seat), name and get_key() identify the model in
+  the result cache keys.
+  '''
+  name = 'default';
+  # candidate koeficient out of the wishlist and of nobody placed
+  unlisted_koef = 9.0;
+  nobody_koef = 10.0;
+
+  def get_key(self):
+    # model identification (name and parameters)
+    return(self.name);
+
+  def get_team_koef(self, in_team):
+    return(1.0 * (100 - in_team.priority));
+
+  def get_cand_koef(self, in_team, in_cand, in_dprio = None):
+    '''
+    Koeficient of in_cand (None ~ nobody) placed to in_team, in_dprio is
+    dict candidate id -> requirement priority of the team (if known)
+    '''
+    if (in_cand == None):
+      return(self.nobody_koef);
+    if (in_dprio == None):
+      in_dprio = self._get_priorities(in_team);
+    if (in_cand.id in in_dprio):
+      return(in_dprio[in_cand.id] - 1.0);
+    return(self.unlisted_koef);
+
+  def _get_priorities(self, in_team):
+    # dict candidate id -> priority of its first requirement
+    ret_val = { };
+    for i_r in in_team.requirements:
+      ret_val.setdefault(i_r.candidate.id, i_r.priority);
+    return(ret_val);
+
+  def get_cost(self, in_team, in_cand):
+    return(self.get_team_koef(in_team) * self.get_cand_koef(in_team, in_cand));
+
+  def get_costs(self, in_team, in_lcand):
+    # costs of a seat options (Candidate objects, None ~ nobody)
+    team_koef = self.get_team_koef(in_team);
+    dprio = self._get_priorities(in_team);
+    return([team_koef * self.get_cand_koef(in_team, i_c, dprio) for i_c in in_lcand]);
+
+
+# ---------------------------------------------------------------------------
+class EmptySeatPenaltyModel(ScoringModel):
+  '''
+  Default model with empty seats of the top teams penalized: a seat of a
+  team of priority <= top_priority taking nobody costs empty_koef times the
+  default (100 - team priority) * nobody_koef, the other costs are default
+  '''
+  name = 'empty-penalty';
+  top_priority = 1;
+  empty_koef = 3.0;
+
+  def __init__(self, in_top_priority = None, in_empty_koef = None):
+    if (in_top_priority != None):
+      self.top_priority = in_top_priority;
+    if (in_empty_koef != None):
+      self.empty_koef = in_empty_koef;
+
+  def get_key(self):
+    return("%s~%d~%g" % (self.name, self.top_priority, self.empty_koef));
+
+  def get_cand_koef(self, in_team, in_cand, in_dprio = None):
+    ret_val = ScoringModel.get_cand_koef(self, in_team, in_cand, in_dprio);
+    if ((in_cand == None) and (in_team.priority <= self.top_priority)):
+      ret_val *= self.empty_koef;
+    return(ret_val);
+
+
+# ---------------------------------------------------------------------------
+class Problem(object):
+  '''
+  Compiled immutable placement problem
+
+  Built once from the teams / candidates / requirements / decisions object
+  graph. Teams and candidates are referred by their ids, every team is
+  expanded into capacity seats (solver rows): decided seats first, then
+  the open ones. The team -> (candidate, priority) wishlists and the seat
+  options with their dissapointment (ScoringModel costs) are kept in CSR
+  form (row pointers into flat array columns), option -1 ~ nobody placed.
+  Solver engines take their options and costs from here instead of the
+  Team objects.
+
+  Candidate preferences (candidate -> (team, priority)) are kept in CSR
+  form too, for the stable placement engine.
+
+  Open seats of one team are interchangeable, seat_sym marks a seat that
+  has to take an option of the same or higher index than the previous
+  seat (options of such seats are sorted: nobody first, then candidate
+  ids), so every placement is represented by a single choice.
+  '''
+  __slots__ = ('team_cnt', 'seat_cnt', 'cand_cnt', 'reduce_ena', 'model',
+               'team_priority', 'team_seat_ptr',
+               'seat_team', 'seat_decision', 'seat_sym',
+               'req_ptr', 'req_cand', 'req_prio',
+               'opt_ptr', 'opt_cand', 'opt_cost',
+               'pref_ptr', 'pref_team', 'pref_prio');
+
+  def __init__(self, in_data, in_reduce_ena = False, in_base = None, in_lindx = None,
+               in_model = None):
+    '''
+    Compile in_data costs by in_model (default ScoringModel), with in_base
+    Problem given only in_lindx teams get compiled again, the rows of the
+    other ones are copied from in_base (and its model is kept)
+    '''
+    if (in_base != None):
+      in_model = in_base.model;
+    elif (in_model == None):
+      in_model = ScoringModel();
+    lindx = set();
+    if (in_lindx != None):
+      lindx = set(in_lindx);
+    cols = self._new_cols();
+    for indx in xrange(len(in_data['teams'])):
+      if ((in_base != None) and (indx not in lindx)):
+        # unchanged team - copy its rows
+        in_base._copy_team(cols, indx);
+        continue;
+      t = in_data['teams'][indx];
+      cols['team_priority'].append(t.priority);
+      for i_r in t.requirements:
+        cols['req_cand'].append(i_r.candidate.id);
+        cols['req_prio'].append(i_r.priority);
+      lseat = [ ];
+      for i_c in t.get_decided():
+        # decided seat - one case
+        lseat.append((i_c.id, [i_c.id]));
+      for i_s in xrange(t.capacity - len(t.decisions)):
+        lseat.append((-1, self._get_seat_options(t, in_reduce_ena)));
+      for i_s in xrange(len(lseat)):
+        cols['seat_team'].append(indx);
+        cols['seat_decision'].append(lseat[i_s][0]);
+        cols['seat_sym'].append((i_s > len(t.decisions)) and 1 or 0);
+        lcand = [ ];
+        for i_o in lseat[i_s][1]:
+          if (i_o == None):
+            cols['opt_cand'].append(-1);
+            lcand.append(None);
+          else:
+            cols['opt_cand'].append(i_o);
+            lcand.append(in_data['candidates'][i_o]);
+        cols['opt_cost'].extend(in_model.get_costs(t, lcand));
+        cols['opt_ptr'].append(len(cols['opt_cand']));
+      cols['req_ptr'].append(len(cols['req_cand']));
+      cols['team_seat_ptr'].append(len(cols['seat_team']));
+    for i_c in in_data['candidates']:
+      for i_p in i_c.preferences:
+        cols['pref_team'].append(i_p.team.id);
+        cols['pref_prio'].append(i_p.priority);
+      cols['pref_ptr'].append(len(cols['pref_team']));
+    self._set_cols(cols, len(in_data['candidates']), in_reduce_ena, in_model);
+
+  def _new_cols(self):
+    # empty array columns (row pointers start with 0)
+    cols = { };
+    for i_s in ['team_priority', 'seat_team', 'seat_decision', 'req_cand',
+                'req_prio', 'opt_cand', 'pref_team', 'pref_prio']:
+      cols[i_s] = array.array('l');
+    for i_s in ['team_seat_ptr', 'req_ptr', 'opt_ptr', 'pref_ptr']:
+      cols[i_s] = array.array('l', [0]);
+    cols['seat_sym'] = array.array('b');
+    cols['opt_cost'] = array.array('d');
+    return(cols);
+
+  def _copy_team(self, in_cols, in_indx, in_keep = None):
+    '''
+    Append rows of in_indx team to in_cols, in_keep is dict seat -> list of
+    option indexes the seat keeps (all options by default)
+    '''
+    if (in_keep == None):
+      in_keep = { };
+    cols = in_cols;
+    cols['team_priority'].append(self.team_priority[in_indx]);
+    cols['req_cand'].extend(self.req_cand[self.req_ptr[in_indx]:self.req_ptr[in_indx + 1]]);
+    cols['req_prio'].extend(self.req_prio[self.req_ptr[in_indx]:self.req_ptr[in_indx + 1]]);
+    for i_s in self.get_seats(in_indx):
+      cols['seat_team'].append(len(cols['team_priority']) - 1);
+      cols['seat_decision'].append(self.seat_decision[i_s]);
+      cols['seat_sym'].append(self.seat_sym[i_s]);
+      a = self.opt_ptr[i_s];
+      if (i_s in in_keep):
+        for i_k in in_keep[i_s]:
+          cols['opt_cand'].append(self.opt_cand[a + i_k]);
+          cols['opt_cost'].append(self.opt_cost[a + i_k]);
+      else:
+        cols['opt_cand'].extend(self.opt_cand[a:self.opt_ptr[i_s + 1]]);
+        cols['opt_cost'].extend(self.opt_cost[a:self.opt_ptr[i_s + 1]]);
+      cols['opt_ptr'].append(len(cols['opt_cand']));
+    cols['req_ptr'].append(len(cols['req_cand']));
+    cols['team_seat_ptr'].append(len(cols['seat_team']));
+
+  def _set_cols(self, in_cols, in_cand_cnt, in_reduce_ena, in_model):
+    self._set('team_cnt', len(in_cols['team_priority']));
+    self._set('seat_cnt', len(in_cols['seat_team']));
+    self._set('cand_cnt', in_cand_cnt);
+    self._set('reduce_ena', in_reduce_ena);
+    self._set('model', in_model);
+    for i_k, i_v in in_cols.items():
+      self._set(i_k, i_v);
+
+  def _set(self, in_name, in_value):
+    object.__setattr__(self, in_name, in_value);
+
+  def __setattr__(self, in_name, in_value):
+    raise Exception("Problem.%s cannot be changed, Problem is immutable!" % in_name);
+
+  def __getstate__(self):
+    int_dict = { };
+    for i_s in self.__slots__:
+      int_dict[i_s] = getattr(self, i_s);
+    return(int_dict);
+
+  def __setstate__(self, in_state):
+    for i_k, i_v in in_state.items():
+      self._set(i_k, i_v);
+
+  def _get_seat_options(self, in_team, in_reduce_ena):
+    int_list = [ ];
+    if (in_team.capacity > 1):
+      # interchangeable seats - nobody and sorted candidates
+      int_list.append(None);
+      int_list.extend(sorted(set([i_r.candidate.id for i_r in in_team.requirements])));
+      return(int_list);
+    # team might not get anyone
+    if( (in_reduce_ena) and \
+        (len(in_team.requirements) == 1) and \
+        (in_team.requirements[0].candidate.decision == None) and \
+        (len(in_team.requirements[0].candidate.requirements) == 1) ):
+      # do not insert None if in_reduce_ena &&
+      #                   team has single requirement &&
+      #          the candidate has single requirement &&
+      #                     candidate has no decision
+      pass;
+    else:
+      # otherwise always append None ~ not placed candidated
+      int_list.append(None);
+    for i_r in in_team.requirements:
+      # browse team's requirements
+      int_list.append(i_r.candidate.id);
+    return(int_list);
+
+  def has_decision(self, in_indx):
+    return(self.seat_decision[in_indx] >= 0);
+
+  def get_requirements(self, in_indx):
+    # list of (candidate id, priority) of the team wishlist
+    a = self.req_ptr[in_indx];
+    b = self.req_ptr[in_indx + 1];
+    return(zip(self.req_cand[a:b].tolist(), self.req_prio[a:b].tolist()));
+
+  def get_preferences(self, in_cand_id):
+    # list of (team index, priority) of the candidate preferences
+    a = self.pref_ptr[in_cand_id];
+    b = self.pref_ptr[in_cand_id + 1];
+    return(zip(self.pref_team[a:b].tolist(), self.pref_prio[a:b].tolist()));
+
+  def get_seats(self, in_indx):
+    # list of the team seat indexes
+    return(range(self.team_seat_ptr[in_indx], self.team_seat_ptr[in_indx + 1]));
+
+  def get_symmetry(self):
+    # list of flags - seat option index has to be >= the previous seat's one
+    return([i_s == 1 for i_s in self.seat_sym]);
+
+  def get_options(self, in_indx):
+    # list of the seat options (candidate ids, None ~ nobody)
+    ret_val = [ ];
+    for i_o in self.opt_cand[self.opt_ptr[in_indx]:self.opt_ptr[in_indx + 1]]:
+      if (i_o < 0):
+        ret_val.append(None);
+      else:
+        ret_val.append(i_o);
+    return(ret_val);
+
+  def get_costs(self, in_indx):
+    # list of the seat options dissapointment (aligned with get_options())
+    return(self.opt_cost[self.opt_ptr[in_indx]:self.opt_ptr[in_indx + 1]].tolist());
+
+  def has_choice(self, in_choice):
+    # in_choice takes an option of every seat (a placement of this table)
+    if (len(in_choice) != self.seat_cnt):
+      return(False);
+    for i_s in xrange(self.seat_cnt):
+      if (in_choice[i_s] not in self.get_options(i_s)):
+        return(False);
+    return(True);
+
+  def get_canonical(self, in_choice):
+    # in_choice with open seats of every team sorted (nobody first)
+    ret_val = list(in_choice);
+    indx = 0;
+    while (indx < len(ret_val)):
+      if (not self.seat_sym[indx]):
+        indx += 1;
+        continue;
+      end = indx;
+      while ((end < len(ret_val)) and (self.seat_sym[end])):
+        end += 1;
+      ret_val[indx - 1:end] = sorted(ret_val[indx - 1:end], key=get_option_key);
+      indx = end;
+    return(ret_val);
+
+  def get_lower_bound(self, in_pass_cnt = 10):
+    '''
+    Dissapointment no placement can beat - dual bound of the assignment LP
+    relaxation: every seat pays its cheapest option (u), a candidate being
+    the cheapest option of several seats gets a price (v <= 0) raising
+    their cost up to the second cheapest seat's alternative (dual ascent),
+    the bound is sum(u) + sum(v)
+    '''
+    lopts = [zip(self.get_options(i_s), self.get_costs(i_s)) for i_s in xrange(self.seat_cnt)];
+    dwanted = { };
+    for i_s in xrange(self.seat_cnt):
+      for i_o, c in lopts[i_s]:
+        if (i_o != None):
+          dwanted.setdefault(i_o, [ ]).append((i_s, c));
+    dprice = { };
+    for i_i in xrange(in_pass_cnt):
+      changed = False;
+      for i_c in sorted(dwanted.keys()):
+        # how much more each seat would pay for i_c before another option
+        # gets cheaper
+        lgain = [ ];
+        for i_s, c in dwanted[i_c]:
+          other = float('inf');
+          for i_o, c2 in lopts[i_s]:
+            if (i_o != i_c):
+              other = min(other, c2 - dprice.get(i_o, 0.0));
+          gain = other - (c - dprice.get(i_c, 0.0));
+          if (gain > 0.0):
+            lgain.append(gain);
+        if (len(lgain) >= 2):
+          # the second most bound seat limits the price raise
+          lgain.sort(reverse=True);
+          dprice[i_c] = dprice.get(i_c, 0.0) - lgain[1];
+          changed = True;
+      if (not changed):
+        break;
+    ret_val = 0.0;
+    for i_s in xrange(self.seat_cnt):
+      ret_val += min([c - dprice.get(i_o, 0.0) for i_o, c in lopts[i_s]]);
+    for i_p in dprice.values():
+      ret_val += i_p;
+    return(ret_val);
+
+  def get_greedy(self):
+    '''
+    Quick valid placement (choice) - seats with the fewest options first take
+    their cheapest option not placed yet, None when a seat gets stuck
+    '''
+    ret_val = [None] * self.seat_cnt;
+    lseats = range(self.seat_cnt);
+    lseats.sort(key = lambda i_s: self.opt_ptr[i_s + 1] - self.opt_ptr[i_s]);
+    used = set();
+    for i_s in lseats:
+      lopts = zip(self.get_costs(i_s), self.get_options(i_s));
+      lopts.sort(key = lambda i_o: (i_o[0], get_option_key(i_o[1])));
+      for c, i_o in lopts:
+        if ((i_o == None) or (i_o not in used)):
+          break;
+      else:
+        return(None);
+      ret_val[i_s] = i_o;
+      if (i_o != None):
+        used.add(i_o);
+    return(self.get_canonical(ret_val));
+
+  def get_release_costs(self, in_choice):
+    '''
+    dict candidate id -> least dissapointment increase to free the candidate
+    in in_choice placement (its seat takes another option, whose holder
+    moves on ... until a free candidate or nobody is taken), 0 for free
+    candidates, inf for decided ones; shortest paths over the cost table
+    (Bellman-Ford), None when a negative cost or cycle shows in_choice is
+    not the best placement
+
+    The costs are the (negated) assignment duals of the candidates: seat s
+    taking option o instead costs at least c(s, o) - c(s, ch[s]) + rel(o)
+    - rel(ch[s]) and at most c(s, o) - c(s, ch[s]) + rel(o).
+    '''
+    dholder = { };
+    for i_s in xrange(self.seat_cnt):
+      if (in_choice[i_s] != None):
+        dholder[in_choice[i_s]] = i_s;
+    ret_val = { };
+    for i_s in xrange(self.seat_cnt):
+      for i_o in self.get_options(i_s):
+        if ((i_o != None) and (i_o not in dholder)):
+          ret_val[i_o] = 0.0;
+    for i_o in dholder.keys():
+      ret_val[i_o] = float('inf');
+    lheld = sorted(dholder.keys());
+    for i_i in xrange(len(lheld) + 1):
+      changed = False;
+      for i_o in lheld:
+        i_s = dholder[i_o];
+        if (self.has_decision(i_s)):
+          continue;
+        lcosts = self.get_costs(i_s);
+        lopts = self.get_options(i_s);
+        cur = lcosts[lopts.index(i_o)];
+        for indx in xrange(len(lopts)):
+          if (lopts[indx] == i_o):
+            continue;
+          c = lcosts[indx] - cur;
+          if (lopts[indx] != None):
+            c += ret_val[lopts[indx]];
+          if (c < ret_val[i_o] - 1e-9):
+            ret_val[i_o] = c;
+            changed = True;
+      if (not changed):
+        break;
+    if (changed):
+      # still relaxing - negative cycle
+      return(None);
+    for i_v in ret_val.values():
+      if (i_v < -1e-9):
+        # moving some seat away improves in_choice
+        return(None);
+    return(ret_val);
+
+  def update(self, in_data, in_lindx):
+    # new Problem with in_lindx teams compiled again from in_data
+    return(Problem(in_data, self.reduce_ena, self, in_lindx));
+
+  def select(self, in_lteams, in_keep = None):
+    '''
+    New Problem of in_lteams teams (in that order) only, in_keep is dict
+    seat -> list of option indexes the seat keeps (all options by default)
+    '''
+    ret_val = object.__new__(Problem);
+    cols = self._new_cols();
+    for indx in in_lteams:
+      self._copy_team(cols, indx, in_keep);
+    # preferences of the selected teams (new team indexes)
+    dteam = dict([(in_lteams[indx], indx) for indx in xrange(len(in_lteams))]);
+    for i_c in xrange(self.cand_cnt):
+      for i_t, i_p in self.get_preferences(i_c):
+        if (i_t in dteam):
+          cols['pref_team'].append(dteam[i_t]);
+          cols['pref_prio'].append(i_p);
+      cols['pref_ptr'].append(len(cols['pref_team']));
+    ret_val._set_cols(cols, self.cand_cnt, self.reduce_ena, self.model);
+    return(ret_val);
+
+
+# ---------------------------------------------------------------------------
+class Registry:
+  '''
+  Name / nick index of teams or candidates
+
+  Names have to be unique, nicks too. A name matching another object's nick
+  makes the lookup ambiguous and such lookup fails.
+  '''
+  def __init__(self, in_list = None):
+    self.names = { };
+    self.nicks = { };
+    self.ambiguous = set();
+    self.cnt = 0;
+    if (in_list != None):
+      for i_o in in_list:
+        self.add(i_o);
+
+  def add(self, in_obj):
+    if (in_obj.name in self.names):
+      raise Exception("Registry.add() failed, duplicate name %s!" % in_obj.name);
+    nick = getattr(in_obj, 'nick', None);
+    if ((nick != None) and (nick in self.nicks)):
+      raise Exception("Registry.add() failed, duplicate nick %s!" % nick);
+    if ((in_obj.name in self.nicks) and (self.nicks[in_obj.name] is not in_obj)):
+      self.ambiguous.add(in_obj.name);
+    self.names[in_obj.name] = in_obj;
+    if (nick != None):
+      if ((nick in self.names) and (self.names[nick] is not in_obj)):
+        self.ambiguous.add(nick);
+      self.nicks[nick] = in_obj;
+    self.cnt += 1;
+
+  def find(self, in_name):
+    if (in_name in self.ambiguous):
+      raise Exception("Registry.find() failed, %s is ambiguous (name and nick)!" % in_name);
+    if (in_name in self.names):
+      return(self.names[in_name]);
+    return(self.nicks.get(in_name, None));
+
+
+# ---------------------------------------------------------------------------
+class ResultStore:
+  '''
+  Bounded store of the N best (dissapointment, choice) pairs
+
+  Kept as a max-heap on (dissapointment, choice) so the worst remembered
+  pair is on top: the threshold check is O(1) and an insert O(log N).
+  Placements of the same dissapointment are all kept, ties are broken by
+  the choice (candidate ids, None first) so every engine ends up with the
+  same pairs.
+  '''
+  def __init__(self, in_maxlen = 1):
+    self.maxlen = in_maxlen;
+    # items: (-dissapointment, negated choice key, choice)
+    self.heap = [ ];
+    # number of pairs remembered (including the ones replaced later)
+    self.insert_cnt = 0;
+
+  def __len__(self):
+    return(len(self.heap));
+
+  def _get_key(self, in_choice):
+    # negated choice key - heap top is the largest choice of the same score
+    int_list = [ ];
+    for i_c in in_choice:
+      if (i_c == None):
+        int_list.append(1);
+      else:
+        int_list.append(-i_c);
+    return(tuple(int_list));
+
+  def get_threshold(self):
+    # dissapointment a new choice has to beat (or equal) to get remembered
+    if (len(self.heap) < self.maxlen):
+      return(float('inf'));
+    return(-self.heap[0][0]);
+
+  def push(self, in_dissapointment, in_choice):
+    if (self.maxlen <= 0):
+      return(False);
+    item = (-in_dissapointment, self._get_key(in_choice), in_choice);
+    if (len(self.heap) < self.maxlen):
+      heapq.heappush(self.heap, item);
+      self.insert_cnt += 1;
+      return(True);
+    if (item[:2] > self.heap[0][:2]):
+      # better than the worst remembered one
+      heapq.heapreplace(self.heap, item);
+      self.insert_cnt += 1;
+      return(True);
+    return(False);
+
+  def get_items(self):
+    # list of (dissapointment, choice) pairs starting from the best one
+    int_list = self.heap[:];
+    int_list.sort(reverse=True);
+    return([(-i_i[0], i_i[2]) for i_i in int_list]);
+
+
+# ---------------------------------------------------------------------------
+class Placement(object):
+  '''
+  Single ranked placement yielded by solve() / iter_placements()
+
+  choice is the candidate id (None ~ nobody) of every team seat, status is
+  'optimal' or the gap against the lower bound (see get_result_status())
+  '''
+  __slots__ = ('data', 'rank', 'dissapointment', 'choice', 'status');
+
+  def __init__(self, in_data, in_rank, in_dissapointment, in_choice, in_status = None):
+    self.data = in_data;
+    self.rank = in_rank;
+    self.dissapointment = in_dissapointment;
+    self.choice = in_choice;
+    self.status = in_status;
+
+  def get_candidates(self, in_team):
+    # list of Candidate objects placed to in_team (Team object or name)
+    if (not isinstance(in_team, Team)):
+      in_team = find_object(self.data, 'teams', in_team);
+    ret_val = [ ];
+    lseat = get_seat_teams(self.data);
+    for indx in xrange(len(self.choice)):
+      if ((lseat[indx] == in_team.id) and (self.choice[indx] != None)):
+        ret_val.append(self.data['candidates'][self.choice[indx]]);
+    return(ret_val);
+
+  def get_names(self):
+    # dict team name -> candidate name (list of them for multi-seat teams)
+    return(results_to_names(self.data, [(self.dissapointment, self.choice)])[0][1]);
+
+  def get_summary(self):
+    # one line team:candidate[,candidate] list ('-' ~ nobody)
+    int_list = [ ];
+    for i_t in self.data['teams']:
+      lnames = [i_c.name for i_c in self.get_candidates(i_t)];
+      int_list.append("%s:%s" % (i_t.name, ",".join(lnames) or "-"));
+    return(" ".join(int_list));
+
+  def __str__(self):
+    return("#%d dissapointment:%.1f %s %s" % (self.rank, self.dissapointment,
+                                                self.status, self.get_summary()));
+
+
 # ---------------------------------------------------------------------------
 class Choice:
-  def __init__(self, in_loc = None):
+  def __init__(self, in_loc = None, in_prefix = None, in_sym = None):
     self.reset();
     if (in_loc != None):
-      self.init(in_loc);
+      self.init(in_loc, in_prefix, in_sym);
   
   def reset(self):
     self.lindx = [ ];
@@ -243,13 +972,27 @@ class Choice:
     self.lindx_start = None;
     self.iteration = None;
     self.lchoice = None;
+    # number of leading 'digits' fixed (shard of the search space)
+    self.fixed_cnt = 0;
+    # flags - 'digit' has to be >= the previous one (interchangeable seats)
+    self.lsym = [ ];
+    # number of index tuples rejected (candidate placed twice)
+    self.reject_cnt = 0;
   
-  def init(self, in_loc):
+  def init(self, in_loc, in_prefix = None, in_sym = None):
     self.loc = in_loc;
-    self.lindx = [0] * len(self.loc);
-    self.lindx_start = [0] * len(self.loc);
+    if (in_prefix == None):
+      in_prefix = [ ];
+    self.fixed_cnt = len(in_prefix);
+    self.lsym = [False] * len(self.loc);
+    if (in_sym != None):
+      self.lsym = list(in_sym[:len(self.loc)]);
+    self.lindx = list(in_prefix) + [0] * (len(self.loc) - self.fixed_cnt);
+    self._raise_indx(self.lindx, self.fixed_cnt);
+    self.lindx_start = self.lindx[:];
     ###print "Choice.init():" + str(self.loc) + str(self.lindx) + str(self.lindx_start)
     self.lchoice = None;
+    self.reject_cnt = 0;
   
   def _next_indx(self):
     ret_val = True;
@@ -259,12 +1002,15 @@ class Choice:
       # first query
       self.iteration = 0;
     else:
-      for indx in xrange(len(lindx)-1, -1, -1):
-        # browse 'digits' from right to left
+      int_start = self.fixed_cnt;
+      for indx in xrange(len(lindx)-1, self.fixed_cnt-1, -1):
+        # browse not fixed 'digits' from right to left
         lindx[indx] = (lindx[indx] + 1) % len(self.loc[indx]);
         if (lindx[indx] != 0):
           # 'digit' incremented and did not turned into higher one
+          int_start = indx + 1;
           break;
+      self._raise_indx(lindx, int_start);
       
       self.iteration += 1;
       if (lindx == self.lindx_start):
@@ -276,6 +1022,28 @@ class Choice:
     
     return(ret_val);
 
+  def _raise_indx(self, in_lindx, in_start):
+    # lowest 'digits' keeping interchangeable seats in non-decreasing order
+    for indx in xrange(max(in_start, 1), len(in_lindx)):
+      if ((self.lsym[indx]) and (in_lindx[indx] < in_lindx[indx - 1])):
+        in_lindx[indx] = in_lindx[indx - 1];
+
+  def get_space_size(self):
+    # number of all index tuples (valid or not) ~ product of option counts
+    ret_val = 1;
+    for i_l in self.loc[self.fixed_cnt:]:
+      ret_val *= len(i_l);
+    return(ret_val);
+
+  def get_position(self):
+    # number of index tuples generated so far (odometer position)
+    if (self.iteration == None):
+      return(0);
+    ret_val = 0;
+    for indx in xrange(self.fixed_cnt, len(self.lindx)):
+      ret_val = ret_val * len(self.loc[indx]) + self.lindx[indx];
+    return(ret_val + 1);
+
   def _indx2choice(self):
     int_list = [ ];
     for i_i in xrange(len(self.lindx)):
@@ -302,14 +1070,124 @@ class Choice:
         if (self._choice_check()):
           return(self.lchoice);
         else:
+          self.reject_cnt += 1;
           continue;
       else:
         break;
     return(ret_val);
 
 
+# ---------------------------------------------------------------------------
+class Profile:
+  '''
+  Search counters and per-phase timers of a solver run (--profile)
+
+  Nothing is measured unless attach() is called: the listed hot-path
+  methods of the solver and of its Choice get replaced by timed wrappers
+  on the instances only. Phase time is the method's own time, the time
+  spent in other timed methods called by it is subtracted (so the time of
+  Solver.next is the dissapointment summing). The wrappers themselves
+  slow the run down, compare the phases relatively.
+  '''
+  # (attribute holding the object or None ~ solver itself, method name)
+  phases = [ (None, 'next'),
+             (None, '_solve'),
+             (None, '_merge'),
+             (None, '_append_choice_data'),
+             ('choice', 'next'),
+             ('choice', '_next_indx'),
+             ('choice', '_indx2choice'),
+             ('choice', '_choice_check') ];
+
+  def __init__(self):
+    self.reset();
+
+  def reset(self):
+    # phase name -> [calls, own time]
+    self.timers = { };
+    # time of the timed calls nested in the running ones
+    self.lnested = [ ];
+    # search counters (Solver.get_stats())
+    self.counters = { };
+    self.wall = 0.0;
+
+  def wrap(self, in_obj, in_name, in_phase = None):
+    # replace in_obj.in_name method by its timed version
+    func = getattr(in_obj, in_name);
+    if (in_phase == None):
+      in_phase = "%s.%s" % (in_obj.__class__.__name__, in_name);
+    timer = self.timers.setdefault(in_phase, [0, 0.0]);
+    lnested = self.lnested;
+    def timed(*in_args, **in_kwargs):
+      lnested.append(0.0);
+      t = time.time();
+      try:
+        return(func(*in_args, **in_kwargs));
+      finally:
+        elapsed = time.time() - t;
+        timer[0] += 1;
+        timer[1] += elapsed - lnested.pop();
+        if (len(lnested) > 0):
+          lnested[-1] += elapsed;
+    setattr(in_obj, in_name, timed);
+
+  def attach(self, in_solver):
+    # time the hot-path methods of in_solver (initialized) and its components,
+    # init() has to be wrapped before it is called
+    for i_a, i_m in self.phases:
+      obj = in_solver;
+      if (i_a != None):
+        obj = getattr(in_solver, i_a, None);
+      if ((obj == None) or (not hasattr(obj, i_m)) or (i_m in obj.__dict__)):
+        # not available or wrapped already
+        continue;
+      self.wrap(obj, i_m);
+    for lteams, solver in getattr(in_solver, 'components', [ ]):
+      self.attach(solver);
+
+  def collect(self, in_solver, in_wall):
+    self.counters = in_solver.get_stats();
+    self.wall = in_wall;
+
+  def get_report(self):
+    # dict of the measured values (JSON serializable)
+    ret_val = { };
+    ret_val['counters'] = self.counters.copy();
+    ret_val['wall_s'] = self.wall;
+    ret_val['phases'] = { };
+    for i_p, i_t in self.timers.items():
+      if (i_t[0] > 0):
+        ret_val['phases'][i_p] = { 'calls' : i_t[0], 'time_s' : i_t[1] };
+    return(ret_val);
+
+  def print_report(self):
+    print "Solver profile:";
+    for i_k, i_t in [('generated', "index tuples generated"),
+                     ('rejected', "duplicate tuples rejected"),
+                     ('evaluated', "placements evaluated"),
+                     ('inserted', "result store inserts")]:
+      print "  %-36s %12d" % (i_t, self.counters.get(i_k, 0));
+    print "  %-36s %12s %10s %7s" % ("phase", "calls", "time [ms]", "share");
+    lphases = [(i_t[1], i_p, i_t[0]) for i_p, i_t in self.timers.items() if (i_t[0] > 0)];
+    lphases.sort(reverse=True);
+    for i_s, i_p, i_c in lphases:
+      print "  %-36s %12d %10.1f %6.1f%%" % (i_p, i_c, i_s * 1000.0, 100.0 * get_fraction(i_s, self.wall));
+    print "  %-36s %12s %10.1f" % ("total (wall)", "", self.wall * 1000.0);
+
+  def save_report(self, in_fn):
+    import json;
+    fh = open(in_fn, 'w');
+    json.dump(self.get_report(), fh, indent = 1, sort_keys = True);
+    fh.close();
+
+
 # ---------------------------------------------------------------------------
 class Solver(object):
+  # the search finished proves the results are the N best placements
+  exact = True;
+  # the presolve stage keeps the results of the engine
+  presolve = True;
+
   def __init__(self, in_data, in_best_option_cnt=1):
     self.reset(in_data, in_best_option_cnt);
     
@@ -319,65 +1197,73 @@ class Solver(object):
       self.data = in_data;
     # object carying the current choice
     self.choice = None;
+    # compiled problem
+    self.problem = None;
     # list of choices
     self.loc = [ ];
     # dict - best choices
-    self.dbc = { };
     self.dbc_maxlen = 0;
     if (in_best_option_cnt != None):
       self.dbc_maxlen = in_best_option_cnt;
+    # store of the best choices
+    self.dbc = ResultStore(self.dbc_maxlen);
     # reduce choices for candidates without decision with single requirement
     self.reduce_choices_4_single_req_ena = False;
+    # objective (ScoringModel, default one if None)
+    self.scoring = None;
+    # list of costs (aligned with self.loc)
+    self.loc_cost = [ ];
+    # list of dicts option -> cost
+    self.loc_cost_map = [ ];
+    # fixed leading option indexes (shard of the search space)
+    self.shard = None;
+    # number of placements evaluated
+    self.eval_cnt = 0;
+    # search interrupted by stop()
+    self.stopped = False;
   
-  def get_combination_cnt(self):
-    self.init();
-    int_cnt = 0;
-    while (self.choice.next()):
-      int_cnt += 1;
-    return(int_cnt);
+  def get_space_size(self):
+    # size of the search space (upper bound of the valid placements count)
+    return(self.choice.get_space_size());
+
+  def get_progress(self):
+    # completed fraction of the search space (0.0 - 1.0)
+    return(get_fraction(self.choice.get_position(), self.get_space_size()));
 
   def init(self):
-    # transform the list of teams into self.loc
-    for i_t in self.data['teams']:
-      # browse teams
-      int_list = [ ];
-      if (i_t.decision != None):
-        # decision pending - one case
-        int_list.append(i_t.decision.candidate.id);
-      else:
-        # team might not get anyone
-        if( (self.reduce_choices_4_single_req_ena) and \
-            (len(i_t.requirements) == 1) and \
-            (i_t.requirements[0].candidate.decision == None) and \
-            (len(i_t.requirements[0].candidate.requirements) == 1) ):
-          # do not insert None if self.reduce_choices_4_single_req_ena &&
-          #                                team has single requirement &&
-          #                       the candidate has single requirement &&
-          #                                  candidate has no decision
-          pass;
-        else:
-          # otherwise always append None ~ not placed candidated
-          int_list.append(None);
-        for i_r in i_t.requirements:
-          # browse team's requirements
-          int_list.append(i_r.candidate.id);
-      # append new options for current team
-      self.loc.append(int_list);
+    # compile the problem and take options and costs of every team seat
+    if (self.problem == None):
+      self.problem = Problem(self.data, self.reduce_choices_4_single_req_ena,
+                             in_model = self.scoring);
+    for indx in xrange(self.problem.seat_cnt):
+      self.loc.append(None);
+      self.loc_cost.append(None);
+      self.loc_cost_map.append(None);
+      self._init_seat(indx);
     
-    self.choice = Choice(self.loc);
+    self.choice = Choice(self.loc, self.shard, self.problem.get_symmetry());
+
+  def _init_seat(self, in_indx):
+    self.loc[in_indx] = self.problem.get_options(in_indx);
+    self.loc_cost[in_indx] = self.problem.get_costs(in_indx);
+    self.loc_cost_map[in_indx] = dict(zip(self.loc[in_indx], self.loc_cost[in_indx]));
+
+  def update_teams(self, in_lindx):
+    '''
+    Refresh options and costs of the given teams (indexes) after their
+    decision / requirements changed and forget the results
+    '''
+    self.problem = self.problem.update(self.data, in_lindx);
+    for indx in in_lindx:
+      for i_s in self.problem.get_seats(indx):
+        self._init_seat(i_s);
+    self.choice = Choice(self.loc, self.shard, self.problem.get_symmetry());
+    self.dbc = ResultStore(self.dbc_maxlen);
+    self.eval_cnt = 0;
 
-  
   def _append_choice_data(self, in_dissapointment, in_choice):
     ###print in_dissapointment, in_choice, self.dbc;
-    max_key = -1;
-    if (len(self.dbc.keys()) > 0):
-      max_key = max(self.dbc.keys());
-    if( (len(self.dbc.keys()) == 0) or (in_dissapointment < max_key) ):
-      # we found better solution - need to remember
-      if (len(self.dbc.keys()) >= self.dbc_maxlen):
-        # delete worst result
-        del self.dbc[max_key];
-      self.dbc[in_dissapointment] = in_choice;
+    self.dbc.push(in_dissapointment, in_choice);
   
   def next(self):
     # get current choice
@@ -386,212 +1272,3023 @@ class Solver(object):
       d = 0.0;
       for indx in xrange(len(ch)):
         # browse teams
-        if (self.data['teams'][indx].decision == None):
-          # candidate selection
-          self.data['teams'][indx].deselect_candidate();
-          if (ch[indx] != None ):
-            self.data['teams'][indx].select_candidate(self.data['candidates'][ch[indx]]);
-        d += self.data['teams'][indx].get_dissapointment();
+        d += self.loc_cost_map[indx][ch[indx]];
       
       # remember choice and result
       self._append_choice_data(d, ch);
+      self.eval_cnt += 1;
       
       return(True);
     else:
       return(False);
   
   def get_results(self):
-    return(self.dbc);
+    # list of (dissapointment, choice) pairs starting from the best one
+    return(self.dbc.get_items());
 
+  def stop(self):
+    '''
+    Search interrupted (budget), get_results() returns the best-so-far
+    placements, a greedy one when none was found yet
+    '''
+    self.stopped = True;
+    if (len(self.dbc) == 0):
+      ch = self.problem.get_greedy();
+      if (ch != None):
+        d = 0.0;
+        for indx in xrange(len(ch)):
+          d += self.loc_cost_map[indx][ch[indx]];
+        self._append_choice_data(d, ch);
+
+  def get_proved_cnt(self):
+    # leading results proved to be the best ones while the search is not done
+    return(0);
+
+  def get_lower_bound(self):
+    # dissapointment no placement can beat
+    return(self.problem.get_lower_bound());
+
+  def get_stats(self):
+    # dict of the search counters (see Profile)
+    ret_val = { };
+    ret_val['evaluated'] = self.eval_cnt;
+    ret_val['rejected'] = 0;
+    if (self.choice != None):
+      ret_val['rejected'] = self.choice.reject_cnt;
+    ret_val['generated'] = ret_val['evaluated'] + ret_val['rejected'];
+    ret_val['inserted'] = self.dbc.insert_cnt;
+    return(ret_val);
 
-# common methods
 # ---------------------------------------------------------------------------
+class AssignmentSolver(Solver):
+  '''
+  Exact solver treating the placement as linear assignment problem
 
-def update_ids(in_list):
-  for i in xrange(len(in_list)):
-    in_list[i].id = i;
+  Every team is a row, every candidate a column and every team may also
+  take a 'nobody' column. The cost table is derived from the same options
+  (self.loc) and the same compiled ScoringModel costs as used by the
+  brute-force Solver, so the best result matches it. Decisions are
+  pinned as the only option of their team.
 
-def find_object(in_list, in_name):
-  int_obj = None;
-  for i in in_list:
-    if (i.name == in_name):
-      int_obj = i;
-      break;
-    if ( ('nick' in dir(i)) and (i.nick == in_name) ):
-      int_obj = i;
-      break;
-    
-  return(int_obj);
+  The 2nd, 3rd ... Nth best placements are ranked lazily by Murty's
+  partitioning: each returned placement splits its subproblem into
+  disjoint ones (some team options forced, one forbidden) which are only
+  solved once they get on top of the queue.
+  '''
+  def reset(self, in_data = None, in_best_option_cnt = None):
+    Solver.reset(self, in_data, in_best_option_cnt);
+    # cost of not allowed team-option pair
+    self.forbidden_cost = None;
+    # ranked placements iterator, dissapointment of the last ranked one and
+    # whether the ranking is over
+    self.ranked = None;
+    self.ranked_d = None;
+    self.ranked_done = False;
 
-def get_batch_cnt(in_total_cnt):
-  ret_val = 1;
-  
-  for i_b in [100000, 10000, 1000, 100, 10]:
-    if( (in_total_cnt / (i_b + 0.0)) > 100.0):
-      ret_val = i_b;
-      break;
-  return(ret_val);
+  def init(self):
+    Solver.init(self);
+    self._init_forbidden_cost();
 
+  def _init_forbidden_cost(self):
+    max_cost = 0.0;
+    for i_l in self.loc_cost:
+      for i_c in i_l:
+        max_cost = max(max_cost, abs(i_c));
+    self.forbidden_cost = (max_cost + 1.0) * (len(self.loc) + 1);
 
-# main() definition
-# ---------------------------------------------------------------------------
-def main(in_opts):
-  
-  # data storage
-  # -------------------------------------------------------------------------
-  data = { };
-  data['teams'] = [ ];
-  data['candidates'] = [ ];
-  data['requirements'] = [ ];
-  data['decisions'] = [ ];
-  
-  # load configuration
-  if (in_opts['load_data'] != None):
-    fh = open(in_opts['load_data'], 'r');
-    data = pickle.load(fh);
-    fh.close();
-  else:
-    # fill in the teams
-    indx = 0
-    for i_t in in_opts['add_team']:
-      data['teams'].append(Team(i_t));
-    update_ids(data['teams']);
-    # fill in the candidates
-    for i_c in in_opts['add_candidate']:
-      data['candidates'].append(Candidate(i_c));
-    update_ids(data['candidates']);
-    # fill in the requirements
-    for i_r in in_opts['add_requirement']:
-      data['requirements'].append(Requirement(i_r));
-    update_ids(data['requirements']);
-    # fill in the decisions
-    for i_d in in_opts['add_decision']:
-      data['decisions'].append(Decision(i_d));
-    update_ids(data['decisions']);
-  
-    # link decisions to objects
-    for i_d in data['decisions']:
-      t = find_object(data['teams'], i_d.team);
-      c = find_object(data['candidates'], i_d.candidate);
-      if ((None == c) or (t == None)):
-        raise Exception("Decision %s is invalid" % i_d);
-      i_d.team = t;
-      i_d.candidate = c;
-      t.set_decision(i_d);
-      c.decision = i_d;
-      
-    # link requirements to objects
-    for i_r in data['requirements']:
-      t = find_object(data['teams'], i_r.team);
-      c = find_object(data['candidates'], i_r.candidate);
-      if ((None == c) or (t == None)):
-        raise Exception("Requirement %s is invalid" % i_r);
-      i_r.team = t;
-      i_r.candidate = c;
-      t.requirements.append(i_r);
-      c.requirements.append(i_r);
-  
-  # object listing
-  # -------------------------------------------------------------------------
-  if( (in_opts['list_teams']) or (in_opts['list_all']) ):
-    print "Teams / Positions summary:"
-    for i_t in data['teams']:
-      print "  %s" % i_t;
-  if( (in_opts['list_candidates']) or (in_opts['list_all']) ):
-    print "Candidates summary:"
-    for i_c in data['candidates']:
-      print "  %s" % i_c;
-  if( (in_opts['list_requirements']) or (in_opts['list_all']) ):
-    print "Requirements summary:"
-    for i_r in data['requirements']:
-      print "  %s" % i_r;
-  if( (in_opts['list_decisions']) or (in_opts['list_all']) ):
-    print "Decisions summary:"
-    if (len(data['decisions'])>0):
-      for i_d in data['decisions']:
-        print "  %s" % i_d;
-    else:
-      print "  <none>";
-  
-  # solver part
-  # -------------------------------------------------------------------------
-  results = None;
-  if (in_opts['solve'] == True):
-    
-    print "Solver part started:"
-    solver = Solver(in_data = data, in_best_option_cnt = in_opts['solve_cnt']);
-    
-    # reduce choices for single requirement candidate <-> a team
-    if (in_opts['reduce_placements_for_single_requirement'] == True):
-      solver.reduce_choices_4_single_req_ena = True;
-    
-    # get number of variations
-    loop_cnt = solver.get_combination_cnt();
-    print "  %d different placements found" % loop_cnt;
-    
-    # find the N best choices
-    solver.reset(in_data = data, in_best_option_cnt = in_opts['solve_cnt']);
-    # reduce choices for single requirement candidate <-> a team
-    if (in_opts['reduce_placements_for_single_requirement'] == True):
-      solver.reduce_choices_4_single_req_ena = True;
-    solver.init();
-    
-    i_loop = 0
-    i_batch_cnt = get_batch_cnt(loop_cnt);
-    while (solver.next()):
-      if ((i_loop % i_batch_cnt) == 0):
-        print "  %d/%d placement completed\r" % (i_loop+1, loop_cnt),
-      i_loop += 1;
-    print "  %d placements evaluated        " % i_loop;
-    
-    # get results
-    results = solver.get_results();
-    # store results (allow to be serialized)
-    data['results'] = results;
-    ###print results, results.keys();
-  else:
-    if ('results' in data):
-      results = data['results'];
-  
-  # save configuration/data
-  # -------------------------------------------------------------------------
-  if (in_opts['save_data'] != None):
-    fh = open(in_opts['save_data'], 'w');
-    pickle.dump(data, fh);
-    fh.close();
-  
-  # result presentation
-  # -------------------------------------------------------------------------
-  if( (isinstance(results, dict)) and (len(results.keys())>0) ):
-    print "Solver found best %d result[s] (starting from best one):" % len(results.keys());
-    indx=1
-    r_keys = results.keys()[:];
-    r_keys.sort();
-    for i_d in r_keys:
-      print "  Teams/Positions Solution #%d Summary: (dissapointment:%.1f)" % (indx, i_d);
-      for indx2 in xrange(len(data['teams'])):
-        if (data['teams'][indx2].decision == None):
-          data['teams'][indx2].deselect_candidate();
-          if (results[i_d][indx2] != None ):
-            data['teams'][indx2].select_candidate(data['candidates'][results[i_d][indx2]]);
-        print "  %s" % data['teams'][indx2];
-      print "";
-      indx += 1;
-  else:
-    print "No solution found/requested";
-    
-    ###print in_opts;
-    ###print data;
-    ###print results;
+  def update_teams(self, in_lindx):
+    Solver.update_teams(self, in_lindx);
+    self._init_forbidden_cost();
+    self.ranked = None;
+    self.ranked_d = None;
+    self.ranked_done = False;
 
+  def _solve(self, in_forced = None, in_forbidden = None):
+    '''
+    Solve the assignment, in_forced is dict team -> option, in_forbidden is
+    set of (team, option) pairs, returns (choice, dissapointment, dict team
+    -> lowest reduced cost of its other options) or (None, None, None) when
+    no valid placement exists
+    '''
+    if (in_forced == None):
+      in_forced = { };
+    if (in_forbidden == None):
+      in_forbidden = set();
+    ch = [None] * len(self.loc);
+    lused = set();
+    for i_t, i_o in in_forced.items():
+      ch[i_t] = i_o;
+      if (i_o != None):
+        lused.add(i_o);
+
+    # rows: teams not forced, columns: available candidates + 'nobody' per row
+    lrows = [ ];
+    lcols = set();
+    for indx in xrange(len(self.loc)):
+      if (indx not in in_forced):
+        lrows.append(indx);
+        for i_o in self.loc[indx]:
+          if ((i_o != None) and (i_o not in lused)):
+            lcols.add(i_o);
+    lcols = sorted(lcols);
+    dcols = dict(zip(lcols, xrange(len(lcols))));
+
+    if (len(lrows) > 0):
+      matrix = [ ];
+      for i_t in lrows:
+        row = [self.forbidden_cost] * (len(lcols) + len(lrows));
+        for i_o, i_c in self.loc_cost_map[i_t].items():
+          if ((i_t, i_o) in in_forbidden):
+            continue;
+          if (i_o == None):
+            row[len(lcols):] = [i_c] * len(lrows);
+          elif (i_o in dcols):
+            row[dcols[i_o]] = i_c;
+        matrix.append(row);
+      lassign, u, v = solve_assignment(matrix);
+      for indx in xrange(len(lrows)):
+        if (matrix[indx][lassign[indx]] >= self.forbidden_cost):
+          # no valid placement exists
+          return(None, None, None);
+        if (lassign[indx] < len(lcols)):
+          ch[lrows[indx]] = lcols[lassign[indx]];
+
+    # reduced costs of the not selected options - any placement taking
+    # another option of a team costs at least this much more
+    dalt = { };
+    if (len(lrows) > 0):
+      v_none = max(v[len(lcols):]);
+    for indx in xrange(len(lrows)):
+      i_t = lrows[indx];
+      dalt[i_t] = float('inf');
+      for i_o, i_c in self.loc_cost_map[i_t].items():
+        if ((i_o == ch[i_t]) or ((i_t, i_o) in in_forbidden)):
+          continue;
+        if (i_o == None):
+          dalt[i_t] = min(dalt[i_t], max(i_c - u[indx] - v_none, 0.0));
+        elif (i_o in dcols):
+          dalt[i_t] = min(dalt[i_t], max(i_c - u[indx] - v[dcols[i_o]], 0.0));
+
+    # sum the dissapointment in the team order as Solver.next() does
+    d = 0.0;
+    for indx in xrange(len(ch)):
+      d += self.loc_cost_map[indx][ch[indx]];
+    return(ch, d, dalt);
+
+  def get_progress(self):
+    # ranked placements found out of requested ones
+    return(get_fraction(len(self.dbc), self.dbc_maxlen));
+
+  def iter_ranked(self):
+    '''
+    Generator of (dissapointment, choice) pairs from the best one on
+    '''
+    # queue items: (dissapointment or its lower bound, sequence, choice,
+    #               forced, forbidden, reduced costs of other options);
+    # choice == None ~ not solved yet
+    queue = [ ];
+    seq = 0;
+    # placements yielded (choices of interchangeable seats in any order
+    # are the same placement)
+    lseen = set();
+    ch, d, dalt = self._solve();
+    if (ch != None):
+      heapq.heappush(queue, (d, seq, ch, { }, set(), dalt));
+    while (len(queue) > 0):
+      d, i_s, ch, forced, forbidden, dalt = heapq.heappop(queue);
+      if (ch == None):
+        # solve postponed subproblem
+        ch, d, dalt = self._solve(forced, forbidden);
+        if (ch != None):
+          heapq.heappush(queue, (d, i_s, ch, forced, forbidden, dalt));
+        continue;
+
+      int_ch = self.problem.get_canonical(ch);
+      if (tuple(int_ch) not in lseen):
+        lseen.add(tuple(int_ch));
+        yield (d, int_ch);
+
+      # partition the rest of the subproblem space, the lower bound of a
+      # subproblem is the parent's dissapointment plus the lowest reduced
+      # cost of the forbidden team's other options
+      int_forced = forced.copy();
+      for indx in xrange(len(ch)):
+        if (indx in forced):
+          continue;
+        if (dalt[indx] != float('inf')):
+          int_forbidden = forbidden.copy();
+          int_forbidden.add((indx, ch[indx]));
+          seq += 1;
+          heapq.heappush(queue, (d + dalt[indx], seq, None, int_forced.copy(),
+                                 int_forbidden, None));
+        int_forced[indx] = ch[indx];
+
+  def next(self):
+    if (self.ranked == None):
+      self.ranked = self.iter_ranked();
+    try:
+      d, ch = self.ranked.next();
+    except StopIteration:
+      self.ranked_done = True;
+      return(False);
+    self.ranked_d = d;
+    if (d > self.dbc.get_threshold()):
+      # placements come sorted, no other one can get remembered
+      self.ranked_done = True;
+      return(False);
+    self.eval_cnt += 1;
+    self._append_choice_data(d, ch);
+    return(True);
+
+  def get_proved_cnt(self):
+    # placements are ranked in order, the ones strictly better than the
+    # last ranked one are final (a tie ranked later may still replace a
+    # placement of the same dissapointment in the store)
+    results = self.dbc.get_items();
+    if (self.ranked_done):
+      return(len(results));
+    ret_val = 0;
+    while ((ret_val < len(results)) and (results[ret_val][0] < self.ranked_d)):
+      ret_val += 1;
+    return(ret_val);
 
 
-# main() call
 # ---------------------------------------------------------------------------
-if __name__ == "__main__":
+class BranchBoundSolver(Solver):
+  '''
+  Exact depth-first branch-and-bound solver
+
+  Teams are assigned one by one (decisions first, then the most contested
+  teams), already used candidates are skipped while descending. A subtree
+  is cut once its partial dissapointment plus the optimistic bound of the
+  remaining teams (their cheapest still available option) cannot beat the
+  Nth best remembered placement.
+  '''
+  def reset(self, in_data = None, in_best_option_cnt = None):
+    Solver.reset(self, in_data, in_best_option_cnt);
+    # team indexes in the order of assignment
+    self.team_order = [ ];
+    # option counts and indexes of the levels (search tree position)
+    self.level_cnt = [ ];
+    self.level_indx = [ ];
+    # placements iterator
+    self.placements = None;
+
+  def init(self):
+    Solver.init(self);
+    # how many teams want each candidate
+    dcontest = { };
+    for i_l in self.loc:
+      for i_o in i_l:
+        if (i_o != None):
+          dcontest[i_o] = dcontest.get(i_o, 0) + 1;
+    int_list = [ ];
+    for indx in xrange(len(self.loc)):
+      contest = 0;
+      for i_o in self.loc[indx]:
+        if (i_o != None):
+          contest += dcontest[i_o];
+      int_list.append((not self.problem.has_decision(indx), -contest,
+                       len(self.loc[indx]), indx));
+    int_list.sort();
+    for i_i in int_list:
+      self.team_order.append(i_i[-1]);
+
+  def iter_placements(self):
+    '''
+    Generator of (dissapointment, choice) pairs not cut by the bound
+    '''
+    n = len(self.team_order);
+    # options of each level sorted from the cheapest one
+    lopts = [ ];
+    for i_t in self.team_order:
+      int_list = zip(self.loc_cost[i_t], self.loc[i_t]);
+      int_list.sort();
+      lopts.append(int_list);
+    # bound of the remaining levels ignoring used candidates
+    lbound = [0.0] * (n + 1);
+    for level in xrange(n - 1, -1, -1):
+      lbound[level] = lbound[level + 1] + lopts[level][0][0];
+
+    ch = [None] * len(self.loc);
+    lsym = self.problem.get_symmetry() + [False];
+    # seats assigned already
+    lset = [False] * (len(self.loc) + 1);
+    used = set();
+    lindx = [-1] * n;
+    self.level_cnt = [len(i_l) for i_l in lopts];
+    self.level_indx = lindx;
+    partial = [0.0] * (n + 1);
+    level = 0;
+    if (n == 0):
+      yield (0.0, ch[:]);
+      return;
+    while (level >= 0):
+      i_t = self.team_order[level];
+      # release the option placed on this level last time
+      if ((lindx[level] >= 0) and (ch[i_t] != None)):
+        used.discard(ch[i_t]);
+        ch[i_t] = None;
+      lset[i_t] = False;
+      lindx[level] += 1;
+      if (lindx[level] >= len(lopts[level])):
+        # level exhausted - backtrack
+        lindx[level] = -1;
+        level -= 1;
+        continue;
+      c, i_o = lopts[level][lindx[level]];
+      if ((i_o != None) and (i_o in used)):
+        continue;
+      # interchangeable seats keep their options in non-decreasing order
+      if ( ((lsym[i_t]) and (lset[i_t - 1]) and \
+            (get_option_key(i_o) < get_option_key(ch[i_t - 1]))) or \
+           ((lsym[i_t + 1]) and (lset[i_t + 1]) and \
+            (get_option_key(i_o) > get_option_key(ch[i_t + 1]))) ):
+        continue;
+      d = partial[level] + c;
+      # equal dissapointment may still win the tie-break
+      threshold = self.dbc.get_threshold();
+      if (d + lbound[level + 1] > threshold):
+        # options are sorted, the rest of this level cannot do better
+        lindx[level] = len(lopts[level]);
+        continue;
+      if (d + self._get_bound(lopts, level + 1, used, i_o) > threshold):
+        continue;
+      ch[i_t] = i_o;
+      lset[i_t] = True;
+      if (i_o != None):
+        used.add(i_o);
+      partial[level + 1] = d;
+      if (level == n - 1):
+        # sum the dissapointment in the team order as Solver.next() does
+        d = 0.0;
+        for indx in xrange(len(ch)):
+          d += self.loc_cost_map[indx][ch[indx]];
+        yield (d, ch[:]);
+      else:
+        level += 1;
+
+  def get_progress(self):
+    # fraction of the search tree already visited or cut
+    ret_val = 0.0;
+    int_cnt = 1;
+    for level in xrange(len(self.level_indx)):
+      if (self.level_indx[level] < 0):
+        break;
+      int_cnt *= self.level_cnt[level];
+      ret_val += min(self.level_indx[level], self.level_cnt[level]) / float(int_cnt);
+    return(min(ret_val, 1.0));
+
+  def _get_bound(self, in_lopts, in_level, in_used, in_cand_id):
+    # sum of the cheapest available options of levels in_level and deeper
+    ret_val = 0.0;
+    for indx in xrange(in_level, len(in_lopts)):
+      for c, i_o in in_lopts[indx]:
+        if ((i_o == None) or ((i_o not in in_used) and (i_o != in_cand_id))):
+          ret_val += c;
+          break;
+      else:
+        # no option left for the team
+        return(float('inf'));
+    return(ret_val);
+
+  def next(self):
+    if (self.placements == None):
+      self.placements = self.iter_placements();
+    try:
+      d, ch = self.placements.next();
+    except StopIteration:
+      return(False);
+    self._append_choice_data(d, ch);
+    self.eval_cnt += 1;
+    return(True);
+
+
+# ---------------------------------------------------------------------------
+class ShardedSolver(Solver):
+  '''
+  Brute-force solver spreading the search space over worker processes
+
+  The search space is split into shards by fixing the leading 'digits' of
+  Choice.lindx (the options of the first teams). Each worker enumerates its
+  shard keeping a local top-N, the results are merged into the final one.
+  A stopped search signals the workers, the shards return their best-so-far
+  results which are merged as well.
+  '''
+  # seconds next() waits for a shard done before returning to the caller
+  poll_timeout = 0.5;
+  # seconds stop() waits for a shard stopped before giving up on the rest
+  drain_timeout = 5.0;
+
+  def reset(self, in_data = None, in_best_option_cnt = None, in_workers = None):
+    Solver.reset(self, in_data, in_best_option_cnt);
+    self.workers = 1;
+    if (in_workers != None):
+      self.workers = in_workers;
+    # list of shards (lists of fixed leading option indexes)
+    self.shards = [ ];
+    self.shard_done_cnt = 0;
+    self.pool = None;
+    self.results_iter = None;
+    # multiprocessing.Event the workers stop on
+    self.stop_event = None;
+    # search counters summed over the shards done
+    self.shard_stats = { };
+
+  def __init__(self, in_data, in_best_option_cnt=1, in_workers=1):
+    self.reset(in_data, in_best_option_cnt, in_workers);
+
+  def init(self):
+    Solver.init(self);
+    # fix as many leading teams as needed to feed all the workers
+    fixed_cnt = 0;
+    int_cnt = 1;
+    while ((fixed_cnt < len(self.loc)) and (int_cnt < (self.workers * 4))):
+      int_cnt *= len(self.loc[fixed_cnt]);
+      fixed_cnt += 1;
+    self.shards = [ ];
+    prefix_choice = Choice(self.loc[:fixed_cnt], None, self.problem.get_symmetry());
+    while (prefix_choice.next() != None):
+      # prefixes with a candidate placed twice are skipped by Choice
+      self.shards.append(prefix_choice.lindx[:]);
+
+  def get_progress(self):
+    return(get_fraction(self.shard_done_cnt, len(self.shards)));
+
+  def next(self):
+    import multiprocessing;
+    if (self.results_iter == None):
+      self.stop_event = multiprocessing.Event();
+      self.pool = multiprocessing.Pool(processes = self.workers,
+                                       initializer = _init_shard_worker,
+                                       initargs = (self.problem, self.dbc_maxlen,
+                                                   self.stop_event));
+      self.results_iter = self.pool.imap(_solve_shard, self.shards);
+    try:
+      shard_result = self.results_iter.next(self.poll_timeout);
+    except multiprocessing.TimeoutError:
+      # no shard done yet, let the caller check its budget
+      return(True);
+    except StopIteration:
+      self.pool.close();
+      self.pool.join();
+      self.pool = None;
+      return(False);
+    self._merge_shard(shard_result);
+    return(True);
+
+  def _merge_shard(self, in_shard_result):
+    # shard (results, stats) into the top-N and the search counters
+    results, stats = in_shard_result;
+    for i_d, i_ch in results:
+      self._append_choice_data(i_d, i_ch);
+    self.eval_cnt += stats['evaluated'];
+    for i_k in ['generated', 'rejected']:
+      self.shard_stats[i_k] = self.shard_stats.get(i_k, 0) + stats[i_k];
+    self.shard_done_cnt += 1;
+
+  def stop(self):
+    import multiprocessing;
+    if (self.pool != None):
+      # shards in progress return their best-so-far results, the ones not
+      # started yet return at once
+      self.stop_event.set();
+      try:
+        while (True):
+          self._merge_shard(self.results_iter.next(self.drain_timeout));
+      except (StopIteration, multiprocessing.TimeoutError):
+        pass;
+      self.pool.terminate();
+      self.pool.join();
+      self.pool = None;
+    Solver.stop(self);
+
+  def get_stats(self):
+    # tuples generated and rejected by the workers
+    ret_val = Solver.get_stats(self);
+    ret_val.update(self.shard_stats);
+    return(ret_val);
+
+
+# ---------------------------------------------------------------------------
+class BatchSolver(Solver):
+  '''
+  Enumeration solver scoring placements in NumPy batches
+
+  The options are turned into dense cost[team, option] and
+  candidate[team, option] tables once. Each batch of odometer positions is
+  decoded into an option index array, scored by table lookups and checked
+  for candidates placed twice without touching the Team objects. Only the
+  np.partition-selected best rows of a batch reach the result store.
+  '''
+  # odometer positions evaluated at once
+  batch_size = 65536;
+
+  def reset(self, in_data = None, in_best_option_cnt = None):
+    Solver.reset(self, in_data, in_best_option_cnt);
+    self.numpy = None;
+    # indexes of seats interchangeable with the previous one
+    self.lsym = [ ];
+    self.cost_table = None;
+    self.cand_table = None;
+    self.position = 0;
+    self.space_cnt = 0;
+
+  def init(self):
+    Solver.init(self);
+    try:
+      import numpy;
+    except ImportError:
+      raise Exception("BatchSolver.init() failed, numpy module is not available!");
+    self.numpy = numpy;
+    self.space_cnt = self.get_space_size();
+    max_len = 1;
+    for i_l in self.loc:
+      max_len = max(max_len, len(i_l));
+    self.cost_table = numpy.zeros((len(self.loc), max_len));
+    self.cand_table = numpy.zeros((len(self.loc), max_len), dtype=numpy.int64) - 1;
+    for indx in xrange(len(self.loc)):
+      for i_i in xrange(len(self.loc[indx])):
+        self.cost_table[indx, i_i] = self.loc_cost[indx][i_i];
+        if (self.loc[indx][i_i] != None):
+          self.cand_table[indx, i_i] = self.loc[indx][i_i];
+    self.lsym = [ ];
+    for indx in xrange(len(self.loc)):
+      if (self.problem.seat_sym[indx]):
+        self.lsym.append(indx);
+    self.position = 0;
+
+  def get_progress(self):
+    return(get_fraction(self.position, self.space_cnt));
+
+  def next(self):
+    np = self.numpy;
+    if (self.position >= self.space_cnt):
+      return(False);
+    end = min(self.position + self.batch_size, self.space_cnt);
+    # batch start position (Python long, any search space size) decoded
+    # into option indexes, the batch offsets are added to them with carry
+    lbase = [0] * len(self.loc);
+    pos = self.position;
+    for indx in xrange(len(self.loc) - 1, -1, -1):
+      pos, lbase[indx] = divmod(pos, len(self.loc[indx]));
+    lcarry = np.arange(end - self.position, dtype=np.int64);
+    self.position = end;
+
+    # odometer positions -> option indexes (first team is the highest 'digit')
+    lindx = np.empty((len(lcarry), len(self.loc)), dtype=np.int64);
+    for indx in xrange(len(self.loc) - 1, -1, -1):
+      lcarry += lbase[indx];
+      lindx[:, indx] = lcarry % len(self.loc[indx]);
+      lcarry //= len(self.loc[indx]);
+
+    # sum the dissapointment in the team order as Solver.next() does
+    scores = np.zeros(len(lindx));
+    cands = np.empty(lindx.shape, dtype=np.int64);
+    for indx in xrange(len(self.loc)):
+      scores += self.cost_table[indx][lindx[:, indx]];
+      cands[:, indx] = self.cand_table[indx][lindx[:, indx]];
+
+    # drop placements with a candidate placed twice
+    cands.sort(axis=1);
+    valid = np.logical_not(((cands[:, 1:] == cands[:, :-1]) & (cands[:, 1:] >= 0)).any(axis=1));
+    # drop interchangeable seats out of order (the same placement)
+    for indx in self.lsym:
+      valid &= (lindx[:, indx] >= lindx[:, indx - 1]);
+    lrows = np.flatnonzero(valid);
+    scores = scores[lrows];
+    self.eval_cnt += len(lrows);
+    if (len(lrows) == 0):
+      return(True);
+
+    # candidates for the N best placements (all of the Nth dissapointment)
+    lkeep = np.flatnonzero(scores <= self.dbc.get_threshold());
+    if (len(lkeep) > self.dbc_maxlen):
+      kth = np.partition(scores[lkeep], self.dbc_maxlen - 1)[self.dbc_maxlen - 1];
+      lkeep = lkeep[scores[lkeep] <= kth];
+    for i_r in lkeep:
+      row = lindx[lrows[i_r]];
+      ch = [ ];
+      for indx in xrange(len(self.loc)):
+        ch.append(self.loc[indx][row[indx]]);
+      self._append_choice_data(float(scores[i_r]), ch);
+    return(True);
+
+  def get_stats(self):
+    # every odometer position of the done batches is generated
+    ret_val = Solver.get_stats(self);
+    ret_val['generated'] = self.position;
+    ret_val['rejected'] = self.position - self.eval_cnt;
+    return(ret_val);
+
+
+# ---------------------------------------------------------------------------
+class LocalSearchSolver(Solver):
+  '''
+  Heuristic solver improving a greedy placement (anytime, no proof)
+
+  The greedy start (Problem.get_greedy()) is improved by moving a single
+  seat to a free option (or nobody), by swapping the candidates of two
+  seats or by taking the candidate of another seat which moves to a free
+  option. The best improving ejection chain of up to chain_len seats
+  (seat takes the candidate of another one which takes the candidate of a
+  third one ... the last one takes a free option) is applied while there
+  is one, then the best improving move of the whole neighbourhood. Every
+  local optimum is then kicked (few random seats re-placed) and improved again
+  from the best placement found. All the neighbours scored on the way feed
+  the N best results. The search ends after `patience` kicks per seat
+  without remembering any new placement, or when stopped (--time-limit).
+  '''
+  exact = False;
+  # kicks per seat without a new remembered placement before the end
+  patience = 20;
+  # seats re-placed by a kick
+  kick_size = 3;
+  # longest ejection chain searched
+  chain_len = 16;
+
+  def reset(self, in_data = None, in_best_option_cnt = None):
+    import random;
+    Solver.reset(self, in_data, in_best_option_cnt);
+    # current placement, its dissapointment and candidate -> seat map
+    self.current = None;
+    self.current_d = None;
+    self.dused = { };
+    # best placement found and its dissapointment
+    self.best = None;
+    self.best_d = None;
+    # canonical choices remembered (interchangeable seats in any order)
+    self.lseen = set();
+    # kicks done since the last new remembered placement
+    self.idle_cnt = 0;
+    # result store inserts when the last kick was done
+    self.kick_insert_cnt = None;
+    self.random = random.Random(0);
+    # candidate -> seats having it among the options
+    self.dwanted = { };
+
+  def init(self):
+    Solver.init(self);
+    for indx in xrange(len(self.loc)):
+      for i_o in self.loc[indx]:
+        if (i_o != None):
+          self.dwanted.setdefault(i_o, [ ]).append(indx);
+
+  def get_progress(self):
+    return(get_fraction(self.idle_cnt, self.patience * max(len(self.loc), 1)));
+
+  def _get_dissapointment(self, in_choice):
+    # sum the dissapointment in the seat order as Solver.next() does
+    ret_val = 0.0;
+    for indx in xrange(len(in_choice)):
+      ret_val += self.loc_cost_map[indx][in_choice[indx]];
+    return(ret_val);
+
+  def _set_current(self, in_choice):
+    self.current = list(in_choice);
+    self.current_d = self._get_dissapointment(self.current);
+    self.dused = { };
+    for indx in xrange(len(self.current)):
+      if (self.current[indx] != None):
+        self.dused[self.current[indx]] = indx;
+
+  def _remember(self, in_dissapointment, in_choice):
+    # count the placement as evaluated, remember it when among the N best
+    self.eval_cnt += 1;
+    if (in_dissapointment > self.dbc.get_threshold()):
+      return;
+    ch = self.problem.get_canonical(in_choice);
+    if (tuple(ch) in self.lseen):
+      return;
+    d = self._get_dissapointment(ch);
+    if (self.dbc.push(d, ch)):
+      self.lseen.add(tuple(ch));
+
+  def _get_moves(self, in_indx):
+    '''
+    Generator of (dissapointment change, seat, option, other seat, its
+    option) moves of seat in_indx to another option, the seat using that
+    option (if any) takes the in_indx one (swap) or a free one (ejection)
+    '''
+    ch = self.current;
+    lcost = self.loc_cost_map;
+    i_o = ch[in_indx];
+    for i_o2 in self.loc[in_indx]:
+      if (i_o2 == i_o):
+        continue;
+      delta = lcost[in_indx][i_o2] - lcost[in_indx][i_o];
+      if ((i_o2 == None) or (i_o2 not in self.dused)):
+        yield (delta, in_indx, i_o2, None, None);
+        continue;
+      indx2 = self.dused[i_o2];
+      for i_o3 in self.loc[indx2]:
+        if ( (i_o3 == i_o) or (i_o3 == None) or (i_o3 not in self.dused) ):
+          yield (delta + lcost[indx2][i_o3] - lcost[indx2][i_o2], in_indx, i_o2, indx2, i_o3);
+
+  def _get_neighbour(self, in_indx, in_option, in_indx2, in_option2):
+    ret_val = self.current[:];
+    if (in_indx2 != None):
+      ret_val[in_indx2] = in_option2;
+    ret_val[in_indx] = in_option;
+    return(ret_val);
+
+  def _get_chain(self):
+    '''
+    Best improving ejection chain - a seat takes the candidate of another
+    seat, that one the candidate of a third one ... the last one takes a
+    free option (queue based Bellman-Ford over the 'seat x gives up its
+    option' changes),
+    returns the new choice or None
+    '''
+    ch = self.current;
+    lcost = self.loc_cost_map;
+    n = len(ch);
+    # cheapest change of seat x giving up its option and the option taken
+    # (with the seat giving it up or None)
+    ldist = [float('inf')] * n;
+    lnext = [None] * n;
+    # chain lengths (bound the relaxing around negative cycles)
+    ldepth = [0] * n;
+    for indx in xrange(n):
+      for i_o in self.loc[indx]:
+        if ((i_o != ch[indx]) and ((i_o == None) or (i_o not in self.dused))):
+          delta = lcost[indx][i_o] - lcost[indx][ch[indx]];
+          if (delta < ldist[indx]):
+            ldist[indx] = delta;
+            lnext[indx] = (i_o, None);
+    # queue of seats whose change got cheaper, the seats wanting their
+    # candidate get relaxed
+    queue = collections.deque(xrange(n));
+    lqueued = [True] * n;
+    while (len(queue) > 0):
+      indx2 = queue.popleft();
+      lqueued[indx2] = False;
+      i_o = ch[indx2];
+      if ((i_o == None) or (ldepth[indx2] >= self.chain_len)):
+        continue;
+      for indx in self.dwanted.get(i_o, [ ]):
+        if (indx == indx2):
+          continue;
+        delta = lcost[indx][i_o] - lcost[indx][ch[indx]] + ldist[indx2];
+        if (delta < ldist[indx] - 1e-9):
+          ldist[indx] = delta;
+          lnext[indx] = (i_o, indx2);
+          ldepth[indx] = ldepth[indx2] + 1;
+          if (not lqueued[indx]):
+            lqueued[indx] = True;
+            queue.append(indx);
+    lstart = [indx for indx in xrange(n) if (ldist[indx] < -1e-9)];
+    lstart.sort(key = lambda indx: ldist[indx]);
+    for indx in lstart:
+      # follow the chain, it is not valid when it runs into a seat twice
+      ret_val = ch[:];
+      lvisited = set();
+      while ((indx != None) and (indx not in lvisited)):
+        lvisited.add(indx);
+        ret_val[indx], indx = lnext[indx];
+      if (indx == None):
+        self.eval_cnt += 1;
+        return(ret_val);
+    return(None);
+
+  def _improve(self):
+    # single improving chain or move, False in a local optimum
+    ch = self._get_chain();
+    if (ch != None):
+      self._set_current(ch);
+      self._remember(self.current_d, self.current);
+      return(True);
+    # neighbours scored for the N best results
+    best = None;
+    for indx in xrange(len(self.loc)):
+      for i_m in self._get_moves(indx):
+        d = self.current_d + i_m[0];
+        if (d <= self.dbc.get_threshold()):
+          self._remember(d, self._get_neighbour(*i_m[1:]));
+        else:
+          self.eval_cnt += 1;
+        if ((i_m[0] < -1e-9) and ((best == None) or (i_m[0] < best[0]))):
+          best = i_m;
+    if (best == None):
+      return(False);
+    self._set_current(self._get_neighbour(*best[1:]));
+    return(True);
+
+  def _kick(self):
+    # re-place kick_size random open seats of the best placement
+    self._set_current(self.best);
+    lopen = [indx for indx in xrange(len(self.loc)) if (len(self.loc[indx]) > 1)];
+    for indx in self.random.sample(lopen, min(self.kick_size, len(lopen))):
+      lfree = [i_o for i_o in self.loc[indx] if ((i_o == None) or (i_o not in self.dused))];
+      if (len(lfree) > 0):
+        self._set_current(self._get_neighbour(indx, self.random.choice(lfree), None, None));
+    self._remember(self.current_d, self.current);
+
+  def next(self):
+    # single improving step (or kick in a local optimum), the search can be
+    # stopped between any two of them
+    if (self.current == None):
+      ch = self.problem.get_greedy();
+      if (ch == None):
+        # greedy start got stuck, start from the assignment optimum
+        solver = AssignmentSolver(in_data = None, in_best_option_cnt = 1);
+        solver.problem = self.problem;
+        solver.init();
+        ch, d, dalt = solver._solve();
+        if (ch == None):
+          # no valid placement exists
+          return(False);
+      self._set_current(ch);
+      self._remember(self.current_d, self.current);
+      return(True);
+    if (self._improve()):
+      return(True);
+    # local optimum
+    if ((self.best == None) or (self.current_d < self.best_d)):
+      self.best = self.current[:];
+      self.best_d = self.current_d;
+    if (self.kick_insert_cnt != None):
+      if (self.dbc.insert_cnt == self.kick_insert_cnt):
+        self.idle_cnt += 1;
+      else:
+        self.idle_cnt = 0;
+    if (self.idle_cnt >= self.patience * len(self.loc)):
+      return(False);
+    self.kick_insert_cnt = self.dbc.insert_cnt;
+    self._kick();
+    return(True);
+
+
+# ---------------------------------------------------------------------------
+class StableSolver(Solver):
+  '''
+  Stable placement by deferred acceptance (Gale-Shapley), O(T.C)
+
+  Teams rank the candidates of their wishlist by the option costs, the
+  candidates rank the teams by their own preferences (-P), the teams they
+  did not list come after the listed ones in the team priority order.
+  Decided seats are kept and their candidates are off the market. No team
+  and candidate both prefer each other to their placement (a team with an
+  empty seat prefers any candidate of its wishlist).
+
+  Teams propose, so every team gets its best partners over all stable
+  placements - with the default scoring model (strict wishlists) that is
+  the min-dissapointment stable placement. The candidate proposing one
+  (best for the candidates) follows as the 2nd result when it differs.
+  The results are not the N best placements, they are labelled by the gap.
+  '''
+  exact = False;
+  # presolve reductions keep the N best placements, not the stable ones
+  presolve = False;
+
+  def reset(self, in_data = None, in_best_option_cnt = None):
+    Solver.reset(self, in_data, in_best_option_cnt);
+    self.done = False;
+
+  def get_progress(self):
+    if (self.done):
+      return(1.0);
+    return(0.0);
+
+  def _get_market(self):
+    '''
+    Returns dict team -> open seats, dict team -> candidates in the team
+    preference order and dict candidate -> team -> rank by the candidate
+    '''
+    p = self.problem;
+    ldecided = set([i_c for i_c in p.seat_decision if (i_c >= 0)]);
+    dseats = { };
+    dteam = { };
+    drank = { };
+    for i_t in xrange(p.team_cnt):
+      lseats = [i_s for i_s in p.get_seats(i_t) if (not p.has_decision(i_s))];
+      if (len(lseats) == 0):
+        continue;
+      # open seats of a team share their options
+      int_list = [ ];
+      for indx in xrange(len(self.loc[lseats[0]])):
+        i_o = self.loc[lseats[0]][indx];
+        if ((i_o != None) and (i_o not in ldecided)):
+          int_list.append((self.loc_cost[lseats[0]][indx], indx, i_o));
+      int_list.sort();
+      lcands = [ ];
+      for c, indx, i_o in int_list:
+        if (i_o not in lcands):
+          lcands.append(i_o);
+          drank.setdefault(i_o, { })[i_t] = (1, p.team_priority[i_t], i_t);
+      dseats[i_t] = lseats;
+      dteam[i_t] = lcands;
+    for i_c, dteams in drank.items():
+      lprefs = p.get_preferences(i_c);
+      for indx in xrange(len(lprefs)):
+        i_t, i_p = lprefs[indx];
+        if ((i_t in dteams) and (dteams[i_t][0] == 1)):
+          dteams[i_t] = (0, i_p, indx);
+    return(dseats, dteam, drank);
+
+  def _propose_teams(self, in_dseats, in_dteam, in_drank):
+    # team proposing deferred acceptance, returns dict team -> candidates
+    ret_val = dict([(i_t, [ ]) for i_t in in_dteam.keys()]);
+    dholder = { };
+    dnext = dict([(i_t, 0) for i_t in in_dteam.keys()]);
+    lfree = sorted(in_dteam.keys(), reverse=True);
+    while (len(lfree) > 0):
+      i_t = lfree.pop();
+      lcands = in_dteam[i_t];
+      while ((len(ret_val[i_t]) < len(in_dseats[i_t])) and (dnext[i_t] < len(lcands))):
+        i_c = lcands[dnext[i_t]];
+        dnext[i_t] += 1;
+        i_h = dholder.get(i_c, None);
+        if ((i_h == None) or (in_drank[i_c][i_t] < in_drank[i_c][i_h])):
+          dholder[i_c] = i_t;
+          ret_val[i_t].append(i_c);
+          if (i_h != None):
+            # the former holder proposes further
+            ret_val[i_h].remove(i_c);
+            lfree.append(i_h);
+    return(ret_val);
+
+  def _propose_candidates(self, in_dseats, in_dteam, in_drank):
+    # candidate proposing deferred acceptance, returns dict team -> candidates
+    ret_val = dict([(i_t, [ ]) for i_t in in_dteam.keys()]);
+    dpos = { };
+    for i_t, lcands in in_dteam.items():
+      dpos[i_t] = dict([(lcands[indx], indx) for indx in xrange(len(lcands))]);
+    dcand = { };
+    for i_c, dteams in in_drank.items():
+      dcand[i_c] = sorted(dteams.keys(), key=lambda i_t: dteams[i_t]);
+    dnext = dict([(i_c, 0) for i_c in dcand.keys()]);
+    lfree = sorted(dcand.keys(), reverse=True);
+    while (len(lfree) > 0):
+      i_c = lfree.pop();
+      while (dnext[i_c] < len(dcand[i_c])):
+        i_t = dcand[i_c][dnext[i_c]];
+        dnext[i_c] += 1;
+        lheld = ret_val[i_t];
+        if (len(lheld) < len(in_dseats[i_t])):
+          lheld.append(i_c);
+          break;
+        worst = max(lheld, key=lambda i_h: dpos[i_t][i_h]);
+        if (dpos[i_t][i_c] < dpos[i_t][worst]):
+          # the rejected one proposes further
+          lheld.remove(worst);
+          lheld.append(i_c);
+          lfree.append(worst);
+          break;
+    return(ret_val);
+
+  def _get_choice(self, in_dseats, in_dheld):
+    # (dissapointment, choice) of the placement, None if not valid
+    p = self.problem;
+    ch = [ ];
+    for i_s in xrange(p.seat_cnt):
+      if (p.has_decision(i_s)):
+        ch.append(p.seat_decision[i_s]);
+      else:
+        ch.append(None);
+    for i_t, lseats in in_dseats.items():
+      lcands = sorted(in_dheld[i_t]);
+      for indx in xrange(len(lcands)):
+        ch[lseats[indx]] = lcands[indx];
+    ch = p.get_canonical(ch);
+    d = 0.0;
+    for i_s in xrange(p.seat_cnt):
+      if (ch[i_s] not in self.loc_cost_map[i_s]):
+        # nobody is not an option of the seat
+        return(None);
+      d += self.loc_cost_map[i_s][ch[i_s]];
+    return(d, ch);
+
+  def next(self):
+    if (self.done):
+      return(False);
+    dseats, dteam, drank = self._get_market();
+    ldheld = [self._propose_teams(dseats, dteam, drank)];
+    if (self.dbc_maxlen > 1):
+      ldheld.append(self._propose_candidates(dseats, dteam, drank));
+    lchoices = [ ];
+    for i_h in ldheld:
+      result = self._get_choice(dseats, i_h);
+      self.eval_cnt += 1;
+      if ((result != None) and (result[1] not in lchoices)):
+        lchoices.append(result[1]);
+        self._append_choice_data(result[0], result[1]);
+    self.done = True;
+    return(False);
+
+
+# ---------------------------------------------------------------------------
+class PresolveSolver(Solver):
+  '''
+  Exact presolve stage in front of any solver engine
+
+  The compiled problem is reduced before the search:
+    - candidates nobody requested are never placed (reported only)
+    - interchangeable candidates (the same wishlist, no decision): only the
+      first S + N - 1 of them (S ~ seats of the teams requesting them) can
+      take part in the N best placements, any further one can be replaced
+      by N unused ones of a lower id for the same dissapointment
+    - single best placement (N = 1): a candidate requested by single team
+      only and strictly the cheapest option of that team is placed there
+    - teams not sharing any candidate option form independent components,
+      every component is solved by its own engine and the N best
+      placements of the components are merged
+
+  The components are searched in turns (one next() step each), so a search
+  stopped by the budget has the best-so-far placements of all of them.
+  '''
+  # seat value of the components not merged yet
+  merge_placeholder = -2;
+
+  def reset(self, in_data = None, in_best_option_cnt = None, in_engine = None):
+    Solver.reset(self, in_data, in_best_option_cnt);
+    # engine - callable(in_data, in_best_option_cnt) returning a solver
+    self.engine = Solver;
+    if (in_engine != None):
+      self.engine = in_engine;
+    # list of (team indexes, solver) of the components
+    self.components = [ ];
+    # indexes of the components still searched, position of the next turn
+    self.lactive = [ ];
+    self.active_pos = 0;
+    # reductions done
+    self.unrequested_cnt = 0;
+    self.dominated_cnt = 0;
+    self.forced_cnt = 0;
+
+  def __init__(self, in_data, in_best_option_cnt=1, in_engine=None):
+    self.reset(in_data, in_best_option_cnt, in_engine);
+
+  def init(self):
+    if (self.problem == None):
+      self.problem = Problem(self.data, self.reduce_choices_4_single_req_ena,
+                             in_model = self.scoring);
+    p = self.problem;
+    # seat -> option indexes kept
+    keep = { };
+    for i_s in xrange(p.seat_cnt):
+      keep[i_s] = range(len(p.get_options(i_s)));
+    self._drop_dominated(keep);
+    if (self.dbc_maxlen == 1):
+      self._force_uncontested(keep);
+    for lteams in self._get_components(keep):
+      solver = self.engine(in_data = self.data, in_best_option_cnt = self.dbc_maxlen);
+      solver.reduce_choices_4_single_req_ena = self.reduce_choices_4_single_req_ena;
+      solver.problem = p.select(lteams, keep);
+      solver.init();
+      self.lactive.append(len(self.components));
+      self.components.append((lteams, solver));
+      # heuristic engine proves nothing
+      self.exact = ((self.exact) and (solver.exact));
+    if (len(self.components) == 0):
+      self._merge();
+
+  def _get_profiles(self):
+    '''
+    dict candidate id -> sorted list of (team, option cost) of the open
+    seats taking it (the scoring model may tell candidates apart even with
+    the same wishlist entries), teams listing it twice are in the list twice
+    '''
+    p = self.problem;
+    ret_val = { };
+    for i_t in xrange(p.team_cnt):
+      lseats = [i_s for i_s in p.get_seats(i_t) if (not p.has_decision(i_s))];
+      if (len(lseats) == 0):
+        continue;
+      # open seats of a team share their options
+      for i_o, c in zip(p.get_options(lseats[0]), p.get_costs(lseats[0])):
+        if (i_o != None):
+          ret_val.setdefault(i_o, [ ]).append((i_t, c));
+    for i_l in ret_val.values():
+      i_l.sort();
+    return(ret_val);
+
+  def _drop_dominated(self, in_keep):
+    p = self.problem;
+    dprofile = self._get_profiles();
+    lrequested = set();
+    for i_s in xrange(p.seat_cnt):
+      lrequested.update(p.get_options(i_s));
+    for i_c in xrange(p.cand_cnt):
+      if (i_c not in lrequested):
+        self.unrequested_cnt += 1;
+    ldecided = set([i_c for i_c in p.seat_decision if (i_c >= 0)]);
+    # groups of interchangeable candidates
+    dgroup = { };
+    for i_c, i_l in dprofile.items():
+      lteams = [i_r[0] for i_r in i_l];
+      if ((i_c in ldecided) or (len(set(lteams)) != len(lteams))):
+        # decided or requested by a team several times
+        continue;
+      dgroup.setdefault(tuple(i_l), [ ]).append(i_c);
+    ldropped = set();
+    for i_l, lcands in dgroup.items():
+      seat_cnt = 0;
+      for i_t, i_p in i_l:
+        seat_cnt += len(p.get_seats(i_t));
+      lcands.sort();
+      ldropped.update(lcands[seat_cnt + self.dbc_maxlen - 1:]);
+    self.dominated_cnt = len(ldropped);
+    if (len(ldropped) > 0):
+      for i_s in xrange(p.seat_cnt):
+        lopts = p.get_options(i_s);
+        in_keep[i_s] = [i_k for i_k in in_keep[i_s] if (lopts[i_k] not in ldropped)];
+
+  def _force_uncontested(self, in_keep):
+    p = self.problem;
+    # how many seats may take each candidate
+    dcnt = { };
+    for i_s in xrange(p.seat_cnt):
+      lopts = p.get_options(i_s);
+      for i_o in set([lopts[i_k] for i_k in in_keep[i_s]]):
+        dcnt[i_o] = dcnt.get(i_o, 0) + 1;
+    for i_t in xrange(p.team_cnt):
+      lseats = p.get_seats(i_t);
+      if ((len(lseats) != 1) or (p.has_decision(lseats[0]))):
+        continue;
+      i_s = lseats[0];
+      lopts = p.get_options(i_s);
+      lcosts = p.get_costs(i_s);
+      for i_k in in_keep[i_s]:
+        c = lopts[i_k];
+        if ((c == None) or (dcnt[c] != 1)):
+          continue;
+        lothers = [lcosts[i_k2] for i_k2 in in_keep[i_s] if (lopts[i_k2] != c)];
+        if ((len(lothers) == 0) or (lcosts[i_k] < min(lothers))):
+          in_keep[i_s] = [i_k];
+          self.forced_cnt += 1;
+          break;
+
+  def _get_components(self, in_keep):
+    # lists of team indexes sharing candidate options (union-find)
+    p = self.problem;
+    lparent = range(p.team_cnt);
+    def find(in_t):
+      while (lparent[in_t] != in_t):
+        lparent[in_t] = lparent[lparent[in_t]];
+        in_t = lparent[in_t];
+      return(in_t);
+    downer = { };
+    for i_s in xrange(p.seat_cnt):
+      i_t = p.seat_team[i_s];
+      lopts = p.get_options(i_s);
+      for i_k in in_keep[i_s]:
+        c = lopts[i_k];
+        if (c == None):
+          continue;
+        if (c in downer):
+          a = find(downer[c]);
+          b = find(i_t);
+          lparent[max(a, b)] = min(a, b);
+        else:
+          downer[c] = i_t;
+    dcomp = { };
+    for i_t in xrange(p.team_cnt):
+      dcomp.setdefault(find(i_t), [ ]).append(i_t);
+    return([dcomp[i_k] for i_k in sorted(dcomp.keys())]);
+
+  def get_space_size(self):
+    # sum of the component search spaces
+    ret_val = 0;
+    for lteams, solver in self.components:
+      ret_val += solver.get_space_size();
+    return(ret_val);
+
+  def get_progress(self):
+    if (len(self.components) == 0):
+      return(1.0);
+    ret_val = float(len(self.components) - len(self.lactive));
+    for indx in self.lactive:
+      ret_val += self.components[indx][1].get_progress();
+    return(ret_val / len(self.components));
+
+  def next(self):
+    while (len(self.lactive) > 0):
+      self.active_pos %= len(self.lactive);
+      lteams, solver = self.components[self.lactive[self.active_pos]];
+      eval_cnt = solver.eval_cnt;
+      ret_val = solver.next();
+      self.eval_cnt += solver.eval_cnt - eval_cnt;
+      if (ret_val):
+        self.active_pos += 1;
+        return(True);
+      # component solved
+      del self.lactive[self.active_pos];
+      if (len(self.lactive) == 0):
+        self._merge();
+    return(False);
+
+  def stop(self):
+    # merge the best-so-far placements of the components not solved yet
+    if (len(self.lactive) > 0):
+      for indx in self.lactive:
+        lteams, solver = self.components[indx];
+        eval_cnt = solver.eval_cnt;
+        solver.stop();
+        self.eval_cnt += solver.eval_cnt - eval_cnt;
+      self.lactive = [ ];
+      self._merge();
+    Solver.stop(self);
+
+  def _merge(self):
+    '''
+    Combine N best placements of the components one by one, N best of the
+    partial combinations are enough as any of them can only get better by
+    the same further components
+    '''
+    p = self.problem;
+    lmerged = [(0.0, [self.merge_placeholder] * p.seat_cnt)];
+    for lteams, solver in self.components:
+      lseats = [ ];
+      for i_t in lteams:
+        lseats.extend(p.get_seats(i_t));
+      results = solver.get_results();
+      store = ResultStore(self.dbc_maxlen);
+      for i_d, i_ch in lmerged:
+        for i_d2, i_ch2 in results:
+          if (i_d + i_d2 > store.get_threshold()):
+            # results are sorted, the rest cannot get remembered
+            break;
+          ch = i_ch[:];
+          for indx in xrange(len(lseats)):
+            ch[lseats[indx]] = i_ch2[indx];
+          store.push(i_d + i_d2, ch);
+      lmerged = store.get_items();
+    lcost_map = [ ];
+    for i_s in xrange(p.seat_cnt):
+      lcost_map.append(dict(zip(p.get_options(i_s), p.get_costs(i_s))));
+    for i_d, i_ch in lmerged:
+      # sum the dissapointment in the seat order as Solver.next() does
+      d = 0.0;
+      for indx in xrange(len(i_ch)):
+        d += lcost_map[indx][i_ch[indx]];
+      self._append_choice_data(d, i_ch);
+
+  def get_stats(self):
+    # search counters summed over the components
+    ret_val = { };
+    ret_val['inserted'] = self.dbc.insert_cnt;
+    for lteams, solver in self.components:
+      for i_k, i_v in solver.get_stats().items():
+        ret_val[i_k] = ret_val.get(i_k, 0) + i_v;
+    for i_k in ['evaluated', 'rejected', 'generated']:
+      ret_val.setdefault(i_k, 0);
+    return(ret_val);
+
+
+# ---------------------------------------------------------------------------
+class Session:
+  '''
+  Interactive negotiation session keeping the solver state warm
+
+  Decisions and requirements are edited one at a time, only the options and
+  costs of the affected teams get recomputed and the assignment engine
+  re-solves from the updated cost table.
+  '''
+  help_msg = """Session commands:
+  D <team>~<cand>          add decision
+  U <team>[~<cand>]        remove decision of the team (the last one)
+  R <team>~<cand>~<prio>   add requirement or change its priority
+  S [N]                    show N best placements (def: --solve-cnt)
+  L                        list teams
+  Q                        quit""";
+
+  def __init__(self, in_data, in_best_option_cnt = 1, in_reduce_ena = False, in_scoring = None):
+    self.data = in_data;
+    self.best_option_cnt = in_best_option_cnt;
+    self.solver = AssignmentSolver(in_data = in_data, in_best_option_cnt = in_best_option_cnt);
+    self.solver.reduce_choices_4_single_req_ena = in_reduce_ena;
+    self.solver.scoring = in_scoring;
+    self.solver.init();
+
+  def _get_affected(self, in_team, in_cand):
+    # the team and teams requiring the candidate (single requirement reduction)
+    int_set = set([in_team.id]);
+    for i_r in in_cand.requirements:
+      int_set.add(i_r.team.id);
+    return(sorted(int_set));
+
+  def add_decision(self, in_str):
+    d = Decision(in_str);
+    link_decision(self.data, d);
+    self.data['decisions'].append(d);
+    update_ids(self.data['decisions']);
+    self.solver.update_teams(self._get_affected(d.team, d.candidate));
+
+  def remove_decision(self, in_str):
+    int_list = in_str.split('~');
+    t = find_object(self.data, 'teams', int_list[0]);
+    if ((t == None) or (len(t.decisions) == 0)):
+      raise Exception("Team %s has no decision" % int_list[0]);
+    d = t.decisions[-1];
+    if (len(int_list) > 1):
+      c = find_object(self.data, 'candidates', int_list[1]);
+      if ((c == None) or (c.decision == None) or (c.decision.team is not t)):
+        raise Exception("Decision %s is invalid" % in_str);
+      d = c.decision;
+    t.reset_decision(d);
+    d.candidate.decision = None;
+    self.data['decisions'].remove(d);
+    update_ids(self.data['decisions']);
+    self.solver.update_teams(self._get_affected(d.team, d.candidate));
+
+  def set_requirement(self, in_str):
+    r = Requirement(in_str);
+    t = find_object(self.data, 'teams', r.team);
+    c = find_object(self.data, 'candidates', r.candidate);
+    if ((None == c) or (t == None)):
+      raise Exception("Requirement %s is invalid" % in_str);
+    for i_r in t.requirements:
+      if (i_r.candidate == c):
+        # priority change - single team costs
+        i_r.priority = r.priority;
+        self.solver.update_teams([t.id]);
+        return;
+    link_requirement(self.data, r);
+    self.data['requirements'].append(r);
+    update_ids(self.data['requirements']);
+    self.solver.update_teams(self._get_affected(t, c));
+
+  def solve(self, in_best_option_cnt = None):
+    if (in_best_option_cnt == None):
+      in_best_option_cnt = self.best_option_cnt;
+    self.solver.dbc_maxlen = in_best_option_cnt;
+    self.solver.dbc = ResultStore(in_best_option_cnt);
+    self.solver.ranked = None;
+    while (self.solver.next()):
+      pass;
+    return(self.solver.get_results());
+
+  def run(self, in_fh):
+    print self.help_msg;
+    while (True):
+      print ">",
+      line = in_fh.readline();
+      if (len(line) == 0):
+        break;
+      int_list = line.strip().split(None, 1);
+      if (len(int_list) == 0):
+        continue;
+      cmd = int_list[0].upper();
+      arg = None;
+      if (len(int_list) > 1):
+        arg = int_list[1];
+      try:
+        if (cmd == 'Q'):
+          break;
+        elif (cmd == 'D'):
+          self.add_decision(arg);
+        elif (cmd == 'U'):
+          self.remove_decision(arg);
+        elif (cmd == 'R'):
+          self.set_requirement(arg);
+        elif (cmd == 'L'):
+          for i_t in self.data['teams']:
+            print "  %s" % i_t;
+        elif (cmd == 'S'):
+          t = time.time();
+          if (arg != None):
+            results = self.solve(int(arg));
+          else:
+            results = self.solve();
+          print "  solved in %.1f ms" % ((time.time() - t) * 1000.0);
+          print_results(self.data, results);
+        else:
+          print self.help_msg;
+      except Exception, e:
+        print "  error: %s" % e;
 
-  # parameters definition and parsing
+
+# ---------------------------------------------------------------------------
+class ScenarioBatch:
+  '''
+  What-if scenarios solved against one shared compiled base problem
+
+  Every scenario is a list of deltas of the base configuration, the
+  session commands plus a declined candidate:
+    D <team>~<cand>          add decision (moves an already decided candidate)
+    U <team>[~<cand>]        remove decision of the team (the last one)
+    R <team>~<cand>~<prio>   add requirement or change its priority
+    X <cand>                 candidate declines (all requirements dropped)
+  The deltas are applied to the object graph just for compiling the teams
+  they affect, rows of all other teams are copied from the base Problem,
+  and the object graph is restored right after. Candidate ids never change
+  so all scenario results refer to the base configuration objects.
+  '''
+  def __init__(self, in_data, in_reduce_ena = False, in_scoring = None):
+    self.data = in_data;
+    self.problem = Problem(in_data, in_reduce_ena, in_model = in_scoring);
+    # list of (name, list of (command, argument))
+    self.scenarios = [ ];
+    # id(object) -> (object, state) of the objects changed by the deltas
+    self.saved = { };
+
+  def add(self, in_name, in_ldeltas):
+    for i_cmd, i_arg in in_ldeltas:
+      if (i_cmd not in ['D', 'U', 'R', 'X']):
+        raise Exception("Scenario %s: unknown command %s" % (in_name, i_cmd));
+    self.scenarios.append((in_name, in_ldeltas));
+
+  def load(self, in_fn):
+    '''
+    Read scenarios of in_fn, one per line (# comments skipped):
+      <name>: <cmd> <arg>[; <cmd> <arg> ...]
+    '''
+    fh = open(in_fn, 'r');
+    for line in fh:
+      line = line.strip();
+      if ((len(line) == 0) or (line.startswith('#'))):
+        continue;
+      if (':' not in line):
+        raise Exception("Scenario line '%s' has no name" % line);
+      name, deltas = line.split(':', 1);
+      ldeltas = [ ];
+      for i_d in deltas.split(';'):
+        int_list = i_d.strip().split(None, 1);
+        if (len(int_list) == 0):
+          continue;
+        int_list.append(None);
+        ldeltas.append((int_list[0].upper(), int_list[1]));
+      self.add(name.strip(), ldeltas);
+    fh.close();
+
+  def _save(self, in_obj):
+    # remember the object state (list copies) before its first change
+    if (id(in_obj) in self.saved):
+      return;
+    state = in_obj.__getstate__();
+    for i_k, i_v in state.items():
+      if (type(i_v) == type([ ])):
+        state[i_k] = list(i_v);
+    self.saved[id(in_obj)] = (in_obj, state);
+
+  def _restore(self):
+    for i_obj, i_state in self.saved.values():
+      i_obj.__setstate__(i_state);
+    self.saved = { };
+
+  def _find(self, in_key, in_name):
+    ret_val = None;
+    if (in_name != None):
+      ret_val = find_object(self.data, in_key, in_name);
+    if (ret_val == None):
+      raise Exception("Unknown %s %s" % (in_key[:-1], in_name));
+    return(ret_val);
+
+  def _get_affected(self, in_cand):
+    # teams requiring the candidate or decided for it
+    ret_val = set([i_r.team.id for i_r in in_cand.requirements]);
+    if (in_cand.decision != None):
+      ret_val.add(in_cand.decision.team.id);
+    return(ret_val);
+
+  def _remove_decision(self, in_decision):
+    self._save(in_decision.team);
+    self._save(in_decision.candidate);
+    in_decision.team.reset_decision(in_decision);
+    in_decision.candidate.decision = None;
+
+  def _apply(self, in_cmd, in_arg):
+    # apply single delta, returns set of the affected team indexes
+    int_list = (in_arg or '').split('~');
+    if (in_cmd == 'X'):
+      c = self._find('candidates', int_list[0]);
+      ret_val = self._get_affected(c);
+      if (c.decision != None):
+        self._remove_decision(c.decision);
+      self._save(c);
+      for i_r in c.requirements:
+        self._save(i_r.team);
+        i_r.team.requirements.remove(i_r);
+      c.requirements = [ ];
+      return(ret_val);
+    t = self._find('teams', int_list[0]);
+    c = None;
+    if (len(int_list) > 1):
+      c = self._find('candidates', int_list[1]);
+    ret_val = set([t.id]);
+    if (in_cmd == 'U'):
+      if (len(t.decisions) == 0):
+        raise Exception("Team %s has no decision" % t.name);
+      d = t.decisions[-1];
+      if (c != None):
+        if ((c.decision == None) or (c.decision.team is not t)):
+          raise Exception("Decision %s is invalid" % in_arg);
+        d = c.decision;
+      ret_val |= self._get_affected(d.candidate);
+      self._remove_decision(d);
+    elif (c == None):
+      raise Exception("Delta %s %s is invalid" % (in_cmd, in_arg));
+    elif (in_cmd == 'D'):
+      ret_val |= self._get_affected(c);
+      if (c.decision != None):
+        self._remove_decision(c.decision);
+      self._save(t);
+      self._save(c);
+      d = Decision();
+      d.team = t;
+      d.candidate = c;
+      t.set_decision(d);
+      c.decision = d;
+    else:
+      r = Requirement(in_arg);
+      ret_val |= self._get_affected(c);
+      for i_r in t.requirements:
+        if (i_r.candidate == c):
+          self._save(i_r);
+          i_r.priority = r.priority;
+          return(ret_val);
+      self._save(t);
+      self._save(c);
+      r.team = t;
+      r.candidate = c;
+      t.requirements.append(r);
+      c.requirements.append(r);
+    return(ret_val);
+
+  def compile(self, in_ldeltas):
+    # Problem of the base configuration changed by in_ldeltas
+    lindx = set();
+    try:
+      for i_cmd, i_arg in in_ldeltas:
+        lindx |= self._apply(i_cmd, i_arg);
+      ret_val = self.problem.update(self.data, sorted(lindx));
+    finally:
+      self._restore();
+    return(ret_val);
+
+  def run(self, in_best_option_cnt = 1, in_engine = 'assignment', in_presolve = True,
+          in_workers = 1, in_time_limit = None, in_max_evaluations = None):
+    '''
+    Solve the base configuration and every scenario (in_workers processes),
+    returns list of (name, results, status list, evaluated count), results
+    None when the scenario is invalid (status list holds the error)
+    '''
+    lnames = ["base"];
+    largs = [(self.problem, in_best_option_cnt, in_engine, in_presolve,
+              in_time_limit, in_max_evaluations)];
+    lerrors = [None];
+    for i_name, i_ldeltas in self.scenarios:
+      lnames.append(i_name);
+      try:
+        largs.append((self.compile(i_ldeltas), in_best_option_cnt, in_engine,
+                      in_presolve, in_time_limit, in_max_evaluations));
+        lerrors.append(None);
+      except Exception, e:
+        largs.append(None);
+        lerrors.append(str(e));
+    if (in_workers > 1):
+      import multiprocessing;
+      pool = multiprocessing.Pool(processes = in_workers);
+      lout = pool.map(_solve_scenario, largs);
+      pool.close();
+      pool.join();
+    else:
+      lout = map(_solve_scenario, largs);
+    ret_val = [ ];
+    for indx in xrange(len(lnames)):
+      if (lerrors[indx] != None):
+        ret_val.append((lnames[indx], None, [lerrors[indx]], 0));
+      else:
+        ret_val.append((lnames[indx], ) + lout[indx]);
+    return(ret_val);
+
+
+# ---------------------------------------------------------------------------
+class ServeJob:
+  '''
+  Single solve of the service shared by all requests of the same
+  fingerprint while in flight, placements are appended as they arrive
+  '''
+  def __init__(self, in_key, in_data):
+    import threading;
+    self.key = in_key;
+    self.data = in_data;
+    # list of placement dicts (rank, dissapointment, status, placement)
+    self.lplacements = [ ];
+    self.done = False;
+    self.error = None;
+    self.eval_cnt = 0;
+    self.cond = threading.Condition();
+
+  def add(self, in_item):
+    # worker queue item - (rank, dissapointment, choice, status), ('error',
+    # message) or ('done', evaluated count)
+    self.cond.acquire();
+    try:
+      if (in_item[0] == 'error'):
+        self.error = in_item[1];
+        self.done = True;
+      elif (in_item[0] == 'done'):
+        self.eval_cnt = in_item[1];
+        self.done = True;
+      else:
+        rank, d, ch, status = in_item;
+        names = results_to_names(self.data, [(d, ch)])[0][1];
+        self.lplacements.append({ 'rank' : rank, 'dissapointment' : d,
+                                  'status' : status, 'placement' : names });
+      self.cond.notifyAll();
+    finally:
+      self.cond.release();
+
+  def __iter__(self):
+    # placements received so far, then the next ones as they arrive
+    indx = 0;
+    while (True):
+      self.cond.acquire();
+      try:
+        while ((indx >= len(self.lplacements)) and (not self.done)):
+          self.cond.wait(1.0);
+        lnew = self.lplacements[indx:];
+        done = self.done;
+      finally:
+        self.cond.release();
+      for i_p in lnew:
+        yield i_p;
+      indx += len(lnew);
+      if ((done) and (indx >= len(self.lplacements))):
+        break;
+
+
+# ---------------------------------------------------------------------------
+class SolveService:
+  '''
+  Long running local solve service (--serve) of JSON Lines requests
+
+  A request is a line {"records": [<--import JSON records>], "solve_cnt": N,
+  "engine": ..., "scoring": ..., "presolve": ..., "time_limit": ...,
+  "max_evaluations": ...} (missing options come from the command line),
+  the reply streams one line per ranked placement {"rank", "dissapointment",
+  "status", "placement": {team: candidate[s]}} as the engine finds it and
+  ends by {"done": true, "count", "evaluated", "coalesced"} or {"error"}.
+  The solves run in a process pool, requests of the same fingerprint
+  (configuration and options) in flight share a single solve.
+  '''
+  # seconds a job waits for a worker queue item before checking the task
+  poll_timeout = 1.0;
+
+  def __init__(self, in_opts):
+    import threading;
+    self.opts = in_opts;
+    self.workers = max(1, in_opts['workers']);
+    self.pool = None;
+    self.manager = None;
+    # fingerprint -> ServeJob in flight
+    self.jobs = { };
+    self.lock = threading.Lock();
+    self.coalesced_cnt = 0;
+
+  def _get_options(self, in_request):
+    ret_val = { };
+    for i_k in ['solve_cnt', 'engine', 'scoring', 'presolve', 'time_limit',
+                'max_evaluations', 'reduce_placements_for_single_requirement']:
+      ret_val[i_k] = in_request.get(i_k, self.opts[i_k]);
+    if (ret_val['engine'] not in SOLVER_ENGINES):
+      raise Exception("Unknown solver engine %s!" % ret_val['engine']);
+    if (ret_val['scoring'] not in SCORING_MODELS):
+      raise Exception("Unknown scoring model %s!" % ret_val['scoring']);
+    return(ret_val);
+
+  def get_job(self, in_request):
+    '''
+    Returns (ServeJob, coalesced) of the request, the job is started unless
+    the same one is in flight already
+    '''
+    import threading;
+    data = new_data();
+    lrecords = in_request.get('records', [ ]);
+    import_records(data, [get_json_record(lrecords[indx], "record %d" % (indx + 1))
+                          for indx in xrange(len(lrecords))]);
+    opts = self._get_options(in_request);
+    key = get_fingerprint(data, [opts[i_k] for i_k in sorted(opts.keys())]);
+    self.lock.acquire();
+    try:
+      if (key in self.jobs):
+        self.coalesced_cnt += 1;
+        return(self.jobs[key], True);
+      job = ServeJob(key, data);
+      self.jobs[key] = job;
+    finally:
+      self.lock.release();
+    t = threading.Thread(target = self._run_job, args = (job, opts));
+    t.daemon = True;
+    t.start();
+    return(job, False);
+
+  def _run_job(self, in_job, in_opts):
+    # pump the worker queue into the job
+    import Queue;
+    try:
+      queue = self.manager.Queue();
+      result = self.pool.apply_async(_serve_solve, (in_job.data, in_opts, queue));
+      while (not in_job.done):
+        try:
+          in_job.add(queue.get(True, self.poll_timeout));
+        except Queue.Empty:
+          if (not result.ready()):
+            continue;
+          # task over - its items are queued already
+          while ((not in_job.done) and (not queue.empty())):
+            in_job.add(queue.get());
+          if (not in_job.done):
+            # raises the exception the task failed with
+            result.get();
+            raise Exception("Solve ended without a reply");
+    except Exception, e:
+      in_job.add(('error', str(e)));
+    self.lock.acquire();
+    try:
+      del self.jobs[in_job.key];
+    finally:
+      self.lock.release();
+
+  def handle(self, in_line, in_fh):
+    # answer single request line into in_fh
+    import json;
+    try:
+      job, coalesced = self.get_job(json.loads(in_line));
+      cnt = 0;
+      for i_p in job:
+        in_fh.write(json.dumps(i_p) + "\n");
+        in_fh.flush();
+        cnt += 1;
+      if (job.error != None):
+        raise Exception(job.error);
+      reply = { 'done' : True, 'count' : cnt, 'evaluated' : job.eval_cnt,
+                'coalesced' : coalesced };
+    except Exception, e:
+      reply = { 'error' : str(e) };
+    in_fh.write(json.dumps(reply) + "\n");
+    in_fh.flush();
+
+  def serve(self, in_addr):
+    '''
+    Serve requests on in_addr - <host>:<port> or Unix socket path (see
+    get_serve_address()), every connection may send any number of request
+    lines
+    '''
+    import multiprocessing;
+    import SocketServer;
+    service = self;
+    class Handler(SocketServer.StreamRequestHandler):
+      def handle(self):
+        for line in self.rfile:
+          if (len(line.strip()) > 0):
+            service.handle(line, self.wfile);
+    addr = get_serve_address(in_addr);
+    if (isinstance(addr, tuple)):
+      class Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+        allow_reuse_address = True;
+        daemon_threads = True;
+      server = Server(addr, Handler);
+    else:
+      remove_socket(addr);
+      class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+        daemon_threads = True;
+      server = Server(addr, Handler);
+    import multiprocessing.managers;
+    # Ctrl-C stops the service only, the helper processes are terminated
+    self.manager = multiprocessing.managers.SyncManager();
+    self.manager.start(_init_serve_worker);
+    self.pool = multiprocessing.Pool(processes = self.workers, initializer = _init_serve_worker);
+    print "Serving on %s (%d worker[s]), Ctrl-C to stop" % (in_addr, self.workers);
+    sys.stdout.flush();
+    try:
+      server.serve_forever();
+    except KeyboardInterrupt:
+      pass;
+    server.server_close();
+    self.pool.terminate();
+    self.manager.shutdown();
+    if (not isinstance(addr, tuple)):
+      remove_socket(addr);
+
+
+# ---------------------------------------------------------------------------
+class SolutionCache:
+  '''
+  Directory of solver results keyed by the problem fingerprint
+
+  Every entry is a pickle file named by the key, the least recently used
+  entries (file modification time) are evicted once the directory grows
+  over the size limit.
+  '''
+  def __init__(self, in_dir, in_max_size):
+    self.dir = in_dir;
+    self.max_size = in_max_size;
+    if (not os.path.isdir(self.dir)):
+      os.makedirs(self.dir);
+
+  def get_path(self, in_key):
+    return(os.path.join(self.dir, "%s.srl" % in_key));
+
+  def get(self, in_key):
+    import pickle;
+    fn = self.get_path(in_key);
+    if (not os.path.isfile(fn)):
+      return(None);
+    try:
+      fh = open(fn, 'rb');
+      ret_val = pickle.load(fh);
+      fh.close();
+    except (IOError, EOFError, pickle.UnpicklingError):
+      # entry removed or broken meanwhile
+      return(None);
+    # mark as recently used
+    os.utime(fn, None);
+    return(ret_val);
+
+  def put(self, in_key, in_value):
+    import pickle;
+    fn = self.get_path(in_key);
+    fn_tmp = "%s.%d.tmp" % (fn, os.getpid());
+    fh = open(fn_tmp, 'wb');
+    pickle.dump(in_value, fh, pickle.HIGHEST_PROTOCOL);
+    fh.close();
+    os.rename(fn_tmp, fn);
+    self.evict();
+
+  def evict(self):
+    int_list = [ ];
+    total = 0;
+    for i_f in os.listdir(self.dir):
+      if (not i_f.endswith('.srl')):
+        continue;
+      fn = os.path.join(self.dir, i_f);
+      try:
+        st = os.stat(fn);
+      except OSError:
+        continue;
+      int_list.append((st.st_mtime, st.st_size, fn));
+      total += st.st_size;
+    int_list.sort();
+    for i_mtime, i_size, fn in int_list:
+      if (total <= self.max_size):
+        break;
+      try:
+        os.remove(fn);
+      except OSError:
+        pass;
+      total -= i_size;
+
+
+# ---------------------------------------------------------------------------
+class DataFile:
+  '''
+  Versioned binary file of the configuration and the results
+
+  Layout (little endian, every section padded to 8 bytes):
+    header    magic, version, teams / candidates / requirements / decisions
+              / results counts, result width, string table size, fingerprint
+    int32     team priorities, team capacities (since version 2)
+    int32     requirement team ids, candidate ids, priorities
+    int32     decision team ids, candidate ids
+    int32     preference count (since version 3, right after the header),
+              preference candidate ids, team ids, priorities
+    int32     result choices (results x width, -1 ~ nobody)
+    float64   result dissapointments
+    strings   team names, team nicks, candidate names, candidate nicks
+              (NUL separated, empty nick ~ none)
+  The file is memory mapped while read, the arrays are fixed size so a
+  section can be located from the header only.
+
+  load() still builds the Team / Candidate / Requirement / Decision /
+  Preference objects: the listing, linking, Problem compilation and
+  pickling code all walk them, lazy proxies would touch every one of it.
+  The objects are filled in by slots with no name lookups, 100k of them
+  take ~0.15-0.25 s against ~3 ms for the arrays and strings.
+  '''
+  magic = 'CPLACER\0';
+  version = 3;
+  header_fmt = '<8sIIIIIIII40s';
+
+  def __init__(self, in_fn):
+    self.fn = in_fn;
+
+  @staticmethod
+  def is_datafile(in_fn):
+    fh = open(in_fn, 'rb');
+    int_str = fh.read(len(DataFile.magic));
+    fh.close();
+    return(int_str == DataFile.magic);
+
+  def _pack(self, in_array):
+    if (sys.byteorder != 'little'):
+      in_array = array.array(in_array.typecode, in_array);
+      in_array.byteswap();
+    int_str = in_array.tostring();
+    return(int_str + '\0' * (-len(int_str) % 8));
+
+  def _unpack(self, in_mm, in_pos, in_typecode, in_cnt):
+    # returns (array, position of the next section)
+    a = array.array(in_typecode);
+    size = a.itemsize * in_cnt;
+    a.fromstring(in_mm[in_pos:in_pos + size]);
+    if (sys.byteorder != 'little'):
+      a.byteswap();
+    return(a, in_pos + size + (-size % 8));
+
+  def _encode(self, in_str):
+    if (in_str == None):
+      return('');
+    if (isinstance(in_str, unicode)):
+      return(in_str.encode('utf-8'));
+    return(str(in_str));
+
+  def save(self, in_data):
+    lteams = in_data['teams'];
+    lcands = in_data['candidates'];
+    lreqs = in_data['requirements'];
+    ldecs = in_data['decisions'];
+    lprefs = in_data.get('preferences', [ ]);
+    results = get_result_items(in_data.get('results', None) or [ ]);
+    result_width = 0;
+    if (len(results) > 0):
+      result_width = len(results[0][1]);
+    lstr = [self._encode(i_t.name) for i_t in lteams] + \
+           [self._encode(i_t.nick) for i_t in lteams] + \
+           [self._encode(i_c.name) for i_c in lcands] + \
+           [self._encode(i_c.nick) for i_c in lcands];
+    blob = '\0'.join(lstr);
+    lchoice = array.array('i');
+    ldissapointment = array.array('d');
+    for i_d, i_ch in results:
+      ldissapointment.append(i_d);
+      for i_o in i_ch:
+        if (i_o == None):
+          lchoice.append(-1);
+        else:
+          lchoice.append(i_o);
+    fh = open(self.fn, 'wb');
+    fh.write(struct.pack(self.header_fmt, self.magic, self.version,
+                         len(lteams), len(lcands), len(lreqs), len(ldecs),
+                         len(results), result_width, len(blob),
+                         in_data.get('fingerprint', None) or ''));
+    fh.write(self._pack(array.array('i', [len(lprefs)])));
+    fh.write(self._pack(array.array('i', [i_t.priority for i_t in lteams])));
+    fh.write(self._pack(array.array('i', [i_t.capacity for i_t in lteams])));
+    fh.write(self._pack(array.array('i', [i_r.team.id for i_r in lreqs])));
+    fh.write(self._pack(array.array('i', [i_r.candidate.id for i_r in lreqs])));
+    fh.write(self._pack(array.array('i', [i_r.priority for i_r in lreqs])));
+    fh.write(self._pack(array.array('i', [i_d.team.id for i_d in ldecs])));
+    fh.write(self._pack(array.array('i', [i_d.candidate.id for i_d in ldecs])));
+    fh.write(self._pack(array.array('i', [i_p.candidate.id for i_p in lprefs])));
+    fh.write(self._pack(array.array('i', [i_p.team.id for i_p in lprefs])));
+    fh.write(self._pack(array.array('i', [i_p.priority for i_p in lprefs])));
+    fh.write(self._pack(lchoice));
+    fh.write(self._pack(ldissapointment));
+    fh.write(blob);
+    fh.close();
+
+  def load(self):
+    import mmap;
+    fh = open(self.fn, 'rb');
+    mm = mmap.mmap(fh.fileno(), 0, access = mmap.ACCESS_READ);
+    try:
+      return(self._load(mm));
+    finally:
+      mm.close();
+      fh.close();
+
+  def _load(self, in_mm):
+    pos = struct.calcsize(self.header_fmt);
+    if (len(in_mm) < pos):
+      raise Exception("DataFile.load() failed, %s is truncated!" % self.fn);
+    magic, version, team_cnt, cand_cnt, req_cnt, dec_cnt, result_cnt, \
+      result_width, blob_len, fingerprint = struct.unpack(self.header_fmt, in_mm[:pos]);
+    if (magic != self.magic):
+      raise Exception("DataFile.load() failed, %s is not a cplacer data file!" % self.fn);
+    if (version > self.version):
+      raise Exception("DataFile.load() failed, %s version %d is not supported!" % (self.fn, version));
+    pref_cnt = 0;
+    if (version >= 3):
+      int_list, pos = self._unpack(in_mm, pos, 'i', 1);
+      pref_cnt = int_list[0];
+    team_priority, pos = self._unpack(in_mm, pos, 'i', team_cnt);
+    team_capacity = array.array('i', [1] * team_cnt);
+    if (version >= 2):
+      team_capacity, pos = self._unpack(in_mm, pos, 'i', team_cnt);
+    req_team, pos = self._unpack(in_mm, pos, 'i', req_cnt);
+    req_cand, pos = self._unpack(in_mm, pos, 'i', req_cnt);
+    req_prio, pos = self._unpack(in_mm, pos, 'i', req_cnt);
+    dec_team, pos = self._unpack(in_mm, pos, 'i', dec_cnt);
+    dec_cand, pos = self._unpack(in_mm, pos, 'i', dec_cnt);
+    pref_cand, pos = self._unpack(in_mm, pos, 'i', pref_cnt);
+    pref_team, pos = self._unpack(in_mm, pos, 'i', pref_cnt);
+    pref_prio, pos = self._unpack(in_mm, pos, 'i', pref_cnt);
+    lchoice, pos = self._unpack(in_mm, pos, 'i', result_cnt * result_width);
+    ldissapointment, pos = self._unpack(in_mm, pos, 'd', result_cnt);
+    if (len(in_mm) < pos + blob_len):
+      raise Exception("DataFile.load() failed, %s is truncated!" % self.fn);
+    lstr = in_mm[pos:pos + blob_len].split('\0');
+
+    # objects linked by ids directly (no name lookups), all the slots are
+    # set here so the constructors (resets) are skipped
+    data = { };
+    data['teams'] = [ ];
+    for indx in xrange(team_cnt):
+      t = Team.__new__(Team);
+      t.id = indx;
+      t.name = lstr[indx];
+      t.nick = lstr[team_cnt + indx] or None;
+      t.team = None;
+      t.candidate = None;
+      t.priority = team_priority[indx];
+      t.capacity = team_capacity[indx];
+      t.decisions = [ ];
+      t.requirements = [ ];
+      t.candidates = [ ];
+      data['teams'].append(t);
+    data['candidates'] = [ ];
+    for indx in xrange(cand_cnt):
+      c = Candidate.__new__(Candidate);
+      c.id = indx;
+      c.name = lstr[2 * team_cnt + indx];
+      c.nick = lstr[2 * team_cnt + cand_cnt + indx] or None;
+      c.team = None;
+      c.candidate = None;
+      c.decision = None;
+      c.requirements = [ ];
+      c.preferences = [ ];
+      data['candidates'].append(c);
+    data['requirements'] = [ ];
+    for indx in xrange(req_cnt):
+      r = Requirement.__new__(Requirement);
+      r.id = indx;
+      r.name = None;
+      r.team = data['teams'][req_team[indx]];
+      r.candidate = data['candidates'][req_cand[indx]];
+      r.priority = req_prio[indx];
+      r.team.requirements.append(r);
+      r.candidate.requirements.append(r);
+      data['requirements'].append(r);
+    data['decisions'] = [ ];
+    for indx in xrange(dec_cnt):
+      d = Decision();
+      d.id = indx;
+      d.team = data['teams'][dec_team[indx]];
+      d.candidate = data['candidates'][dec_cand[indx]];
+      d.team.set_decision(d);
+      d.candidate.decision = d;
+      data['decisions'].append(d);
+    data['preferences'] = [ ];
+    for indx in xrange(pref_cnt):
+      p = Preference.__new__(Preference);
+      p.id = indx;
+      p.name = None;
+      p.candidate = data['candidates'][pref_cand[indx]];
+      p.team = data['teams'][pref_team[indx]];
+      p.priority = pref_prio[indx];
+      p.candidate.preferences.append(p);
+      data['preferences'].append(p);
+    if (fingerprint.strip('\0')):
+      data['fingerprint'] = fingerprint;
+    if (result_cnt > 0):
+      data['results'] = [ ];
+      lchoice = lchoice.tolist();
+      for indx in xrange(result_cnt):
+        ch = lchoice[indx * result_width:(indx + 1) * result_width];
+        for i_i in xrange(len(ch)):
+          if (ch[i_i] < 0):
+            ch[i_i] = None;
+        data['results'].append((ldissapointment[indx], ch));
+    return(data);
+
+
+# common methods
+# ---------------------------------------------------------------------------
+
+def update_ids(in_list):
+  for i in xrange(len(in_list)):
+    in_list[i].id = i;
+
+def get_registry(in_data, in_key):
+  # name / nick index of in_data[in_key] list, (re)built when the list grew
+  if ('registry' not in in_data):
+    in_data['registry'] = { };
+  if ( (in_key not in in_data['registry']) or \
+       (in_data['registry'][in_key].cnt != len(in_data[in_key])) ):
+    in_data['registry'][in_key] = Registry(in_data[in_key]);
+  return(in_data['registry'][in_key]);
+
+def find_object(in_data, in_key, in_name):
+  return(get_registry(in_data, in_key).find(in_name));
+
+def link_decision(in_data, in_decision):
+  t = find_object(in_data, 'teams', in_decision.team);
+  c = find_object(in_data, 'candidates', in_decision.candidate);
+  if ((None == c) or (t == None)):
+    raise Exception("Decision %s~%s is invalid" % (in_decision.team, in_decision.candidate));
+  in_decision.team = t;
+  in_decision.candidate = c;
+  t.set_decision(in_decision);
+  c.decision = in_decision;
+
+def link_preference(in_data, in_preference):
+  t = find_object(in_data, 'teams', in_preference.team);
+  c = find_object(in_data, 'candidates', in_preference.candidate);
+  if ((None == c) or (t == None)):
+    raise Exception("Preference %s~%s is invalid" % (in_preference.candidate, in_preference.team));
+  in_preference.team = t;
+  in_preference.candidate = c;
+  c.preferences.append(in_preference);
+
+def link_requirement(in_data, in_requirement):
+  t = find_object(in_data, 'teams', in_requirement.team);
+  c = find_object(in_data, 'candidates', in_requirement.candidate);
+  if ((None == c) or (t == None)):
+    raise Exception("Requirement %s~%s is invalid" % (in_requirement.team, in_requirement.candidate));
+  in_requirement.team = t;
+  in_requirement.candidate = c;
+  t.requirements.append(in_requirement);
+  c.requirements.append(in_requirement);
+
+def load_data(in_fn):
+  # configuration & results of binary data file or pickled (older) one
+  if (DataFile.is_datafile(in_fn)):
+    return(DataFile(in_fn).load());
+  import pickle;
+  fh = open(in_fn, 'rb');
+  ret_val = pickle.load(fh);
+  fh.close();
+  ret_val.setdefault('preferences', [ ]);
+  return(ret_val);
+
+def save_data(in_data, in_fn):
+  DataFile(in_fn).save(in_data);
+
+def convert_data(in_src, in_dst):
+  # convert pickled configuration (.srl) into binary data file
+  save_data(load_data(in_src), in_dst);
+
+def get_result_items(in_results):
+  # list of (dissapointment, choice) pairs, dict of older configurations too
+  if (isinstance(in_results, dict)):
+    int_list = in_results.items();
+    int_list.sort();
+    return(int_list);
+  return(in_results);
+
+def add_objects(in_data, in_teams, in_candidates, in_requirements, in_decisions,
+                in_preferences = None, in_locations = None):
+  '''
+  Append new objects to in_data and link requirements, decisions and
+  preferences, in_locations is dict id(object) -> location (file:line)
+  prefixed to the link errors of the object
+  '''
+  in_data['teams'].extend(in_teams);
+  update_ids(in_data['teams']);
+  in_data['candidates'].extend(in_candidates);
+  update_ids(in_data['candidates']);
+  if (in_locations != None):
+    # name indexes built before linking (duplicates are not a link error)
+    get_registry(in_data, 'teams');
+    get_registry(in_data, 'candidates');
+  in_data['requirements'].extend(in_requirements);
+  update_ids(in_data['requirements']);
+  link_objects(in_data, link_requirement, in_requirements, in_locations);
+  in_data['decisions'].extend(in_decisions);
+  update_ids(in_data['decisions']);
+  link_objects(in_data, link_decision, in_decisions, in_locations);
+  # older configurations - no preferences
+  in_data.setdefault('preferences', [ ]);
+  if (in_preferences != None):
+    in_data['preferences'].extend(in_preferences);
+    update_ids(in_data['preferences']);
+    link_objects(in_data, link_preference, in_preferences, in_locations);
+
+def link_objects(in_data, in_link, in_objects, in_locations = None):
+  # in_link(in_data, object) every object, errors located by in_locations
+  if (in_locations == None):
+    for i_o in in_objects:
+      in_link(in_data, i_o);
+    return;
+  for i_o in in_objects:
+    try:
+      in_link(in_data, i_o);
+    except Exception, e:
+      if (id(i_o) not in in_locations):
+        raise;
+      raise Exception("%s: %s" % (in_locations[id(i_o)], e));
+
+def iter_import_records(in_fn):
+  '''
+  Generator of (kind, fields, location) records of CSV (<kind>,<field>...)
+  or JSON Lines ({"kind": <kind>, <field>: ...}) file, kind is one of
+  T/C/R/D/P and fields follow the -T/-C/-R/-D/-P option syntax
+  '''
+  fh = open(in_fn, 'rb');
+  if (os.path.splitext(in_fn)[1].lower() in ['.jsonl', '.json']):
+    import json;
+    # raw_decode() skips the json.loads() wrapper calls (a third of the time)
+    decoder = json.JSONDecoder();
+    i_n = 0;
+    for line in fh:
+      i_n += 1;
+      line = line.strip();
+      if ((len(line) == 0) or (line.startswith('#'))):
+        continue;
+      loc = "%s:%d" % (in_fn, i_n);
+      try:
+        rec, end = decoder.raw_decode(line);
+      except ValueError, e:
+        raise Exception("%s: invalid JSON record (%s)" % (loc, e));
+      if (end != len(line)):
+        raise Exception("%s: invalid JSON record (extra data)" % loc);
+      yield get_json_record(rec, loc);
+  else:
+    import csv;
+    i_n = 0;
+    for row in csv.reader(fh):
+      i_n += 1;
+      if ((len(row) == 0) or (row[0].startswith('#')) or (row[0] == 'kind')):
+        # empty line, comment or header
+        continue;
+      yield (row[0], row[1:], "%s:%d" % (in_fn, i_n));
+  fh.close();
+
+def get_json_record(in_rec, in_loc):
+  # (kind, fields, location) record of {"kind": <kind>, <field>: ...} dict,
+  # strings UTF-8 encoded as read from CSV
+  if (not isinstance(in_rec, dict)):
+    raise Exception("%s: record %s is not a JSON object" % (in_loc, in_rec));
+  kind = in_rec.get('kind');
+  fields = [ ];
+  for i_k in IMPORT_FIELDS.get(kind, ( )):
+    v = in_rec.get(i_k);
+    if (type(v) is unicode):
+      v = v.encode('utf-8');
+    fields.append(v);
+  while ((len(fields) > 0) and (fields[-1] == None)):
+    fields.pop();
+  return((kind, fields, in_loc));
+
+def iter_import_objects(in_records):
+  # generator of (kind, object, location) built from (kind, fields, location)
+  # records
+  for kind, fields, loc in in_records:
+    if (kind not in IMPORT_FIELDS):
+      raise Exception("%s: unknown record kind %s" % (loc, kind));
+    if (len(fields) < IMPORT_FIELDS_REQUIRED[kind]):
+      raise Exception("%s: %s record %s is incomplete" % (loc, kind, fields));
+    obj = IMPORT_CLASSES[kind]();
+    try:
+      obj.init_from_list(fields);
+    except (ValueError, TypeError):
+      raise Exception("%s: %s record %s is invalid" % (loc, kind, fields));
+    yield (kind, obj, loc);
+
+def import_records(in_data, in_records):
+  # add objects of (kind, fields, location) records to in_data
+  dobj = { };
+  for i_k in IMPORT_FIELDS.keys():
+    dobj[i_k] = [ ];
+  # locations of the linked objects (link errors)
+  dloc = { };
+  for kind, obj, loc in iter_import_objects(in_records):
+    dobj[kind].append(obj);
+    if (kind in ['R', 'D', 'P']):
+      dloc[id(obj)] = loc;
+  add_objects(in_data, dobj['T'], dobj['C'], dobj['R'], dobj['D'], dobj['P'], dloc);
+
+def import_data(in_data, in_fn):
+  # import teams, candidates, requirements, decisions and preferences from in_fn file
+  import_records(in_data, iter_import_records(in_fn));
+
+def get_explanation(in_data, in_problem, in_choice):
+  '''
+  Explanation of in_choice placement from the compiled cost table, list of
+  dicts per team: team, candidates placed, decided (all seats), its
+  dissapointment, regret against its first choice(s) and alternatives -
+  list of (candidate or None ~ nobody, least and most dissapointment
+  increase of forcing it), bounds are None when in_choice is not the best
+  placement
+  '''
+  p = in_problem;
+  if (not p.has_choice(in_choice)):
+    raise Exception("get_explanation() failed, the placement is not one of the cost table!");
+  drel = p.get_release_costs(in_choice);
+  ret_val = [ ];
+  for i_t in xrange(p.team_cnt):
+    t = in_data['teams'][i_t];
+    lseats = p.get_seats(i_t);
+    item = { 'team' : t, 'decided' : True, 'dissapointment' : 0.0, 'alternatives' : [ ] };
+    item['candidates'] = [in_data['candidates'][in_choice[i_s]] for i_s in lseats
+                          if (in_choice[i_s] != None)];
+    lplaced = set([in_choice[i_s] for i_s in lseats]);
+    dalt = { };
+    for i_s in lseats:
+      lopts = p.get_options(i_s);
+      lcosts = p.get_costs(i_s);
+      cur = lcosts[lopts.index(in_choice[i_s])];
+      item['dissapointment'] += cur;
+      if (p.has_decision(i_s)):
+        continue;
+      item['decided'] = False;
+      for i_o, c in zip(lopts, lcosts):
+        if ((i_o == in_choice[i_s]) or ((i_o != None) and (i_o in lplaced))):
+          # the seat option or placed to another seat of the team
+          continue;
+        lb = ub = None;
+        if (drel != None):
+          ub = c - cur;
+          if (i_o != None):
+            ub += drel[i_o];
+          lb = ub;
+          if (in_choice[i_s] != None):
+            lb -= drel[in_choice[i_s]];
+          lb = max(lb, 0.0);
+        # best seat of the team to take the option
+        if ((i_o not in dalt) or ((lb != None) and (lb < dalt[i_o][0]))):
+          dalt[i_o] = (lb, ub);
+        elif ((ub != None) and (ub < dalt[i_o][1])):
+          dalt[i_o] = (dalt[i_o][0], ub);
+    for i_o in sorted(dalt.keys(), key=lambda i_k: (dalt[i_k], i_k)):
+      cand = None;
+      if (i_o != None):
+        cand = in_data['candidates'][i_o];
+      item['alternatives'].append((cand, dalt[i_o][0], dalt[i_o][1]));
+    # first choices - the cheapest wishlist candidates of every seat
+    lcands = [i_r.candidate for i_r in t.requirements] + [None] * t.capacity;
+    lcosts = p.model.get_costs(t, lcands);
+    lbest = sorted(zip(lcosts, xrange(len(lcands))))[:t.capacity];
+    item['first'] = [lcands[i_i[1]] for i_i in lbest if (lcands[i_i[1]] != None)];
+    item['regret'] = item['dissapointment'] - sum([i_i[0] for i_i in lbest]);
+    ret_val.append(item);
+  return(ret_val);
+
+def print_explanation(in_data, in_problem, in_choice):
+  print "Explanation of solution #1 (forcing an alternative costs +least[..+most]):";
+  for i_e in get_explanation(in_data, in_problem, in_choice):
+    names = ", ".join([i_c.name for i_c in i_e['candidates']]) or "-";
+    if (i_e['decided']):
+      names += " (decided)";
+    first = ", ".join([i_c.name for i_c in i_e['first']]) or "-";
+    print "  %s: %s, dissapointment:%.1f, regret:%.1f (first choice: %s)" % \
+      (i_e['team'].name, names, i_e['dissapointment'], i_e['regret'], first);
+    int_list = [ ];
+    for i_c, lb, ub in i_e['alternatives']:
+      name = "nobody";
+      if (i_c != None):
+        name = i_c.name;
+      if (lb == None):
+        int_list.append(name);
+      elif (lb == float('inf')):
+        int_list.append("%s (decided)" % name);
+      elif (ub - lb > 1e-9):
+        int_list.append("%s +%.1f..+%.1f" % (name, lb, ub));
+      else:
+        int_list.append("%s +%.1f" % (name, lb));
+    if (len(int_list) > 0):
+      print "    instead: %s" % " | ".join(int_list);
+
+def print_listing(in_data, in_opts):
+  # teams, candidates, requirements, decisions (and preferences) selected by
+  # the list_* options
+  if( (in_opts['list_teams']) or (in_opts['list_all']) ):
+    print "Teams / Positions summary:"
+    for i_t in in_data['teams']:
+      print "  %s" % i_t;
+  if( (in_opts['list_candidates']) or (in_opts['list_all']) ):
+    print "Candidates summary:"
+    for i_c in in_data['candidates']:
+      print "  %s" % i_c;
+  if( (in_opts['list_requirements']) or (in_opts['list_all']) ):
+    print "Requirements summary:"
+    for i_r in in_data['requirements']:
+      print "  %s" % i_r;
+  if( (in_opts['list_decisions']) or (in_opts['list_all']) ):
+    print "Decisions summary:"
+    if (len(in_data['decisions'])>0):
+      for i_d in in_data['decisions']:
+        print "  %s" % i_d;
+    else:
+      print "  <none>";
+  if ( (in_opts['list_all']) and (len(in_data['preferences']) > 0) ):
+    print "Preferences summary:"
+    for i_p in in_data['preferences']:
+      print "  %s" % i_p;
+
+def print_results(in_data, in_results, in_lstatus = None):
+  int_list = [ ];
+  if (in_results != None):
+    int_list = get_result_items(in_results);
+  if (len(int_list) > 0):
+    print "Solver found best %d result[s] (starting from best one):" % len(int_list);
+    lseat = get_seat_teams(in_data);
+    indx=1
+    for i_d, i_ch in int_list:
+      int_str = "";
+      if (in_lstatus != None):
+        int_str = ", %s" % in_lstatus[indx - 1];
+      print "  Teams/Positions Solution #%d Summary: (dissapointment:%.1f%s)" % (indx, i_d, int_str);
+      for i_t in in_data['teams']:
+        i_t.deselect_candidate();
+      for indx2 in xrange(len(i_ch)):
+        # browse team seats, decided candidates are selected already
+        t = in_data['teams'][lseat[indx2]];
+        if ( (i_ch[indx2] != None) and \
+             (in_data['candidates'][i_ch[indx2]] not in t.get_decided()) ):
+          t.select_candidate(in_data['candidates'][i_ch[indx2]]);
+      for i_t in in_data['teams']:
+        print "  %s" % i_t;
+      print "";
+      indx += 1;
+  else:
+    print "No solution found/requested";
+
+def get_fingerprint(in_data, in_extra = None):
+  '''
+  Canonical hash of the problem (teams, candidates, requirements and
+  decisions independent of their order) extended by in_extra list
+  '''
+  import hashlib;
+  int_list = [ ];
+  for i_t in in_data['teams']:
+    if (i_t.capacity == 1):
+      int_list.append("T~%s~%s" % (i_t.name, i_t.priority));
+    else:
+      int_list.append("T~%s~%s~%d" % (i_t.name, i_t.priority, i_t.capacity));
+  for i_c in in_data['candidates']:
+    int_list.append("C~%s" % i_c.name);
+  for i_r in in_data['requirements']:
+    int_list.append("R~%s~%s~%s" % (i_r.team.name, i_r.candidate.name, i_r.priority));
+  for i_d in in_data['decisions']:
+    int_list.append("D~%s~%s" % (i_d.team.name, i_d.candidate.name));
+  for i_p in in_data.get('preferences', [ ]):
+    int_list.append("P~%s~%s~%s" % (i_p.candidate.name, i_p.team.name, i_p.priority));
+  int_list.sort();
+  if (in_extra != None):
+    int_list.extend(["X~%s" % i_x for i_x in in_extra]);
+  int_str = "\n".join(int_list);
+  if (isinstance(int_str, unicode)):
+    # unicode names of the library objects
+    int_str = int_str.encode('utf-8');
+  return(hashlib.sha1(int_str).hexdigest());
+
+def results_to_names(in_data, in_results):
+  '''
+  Results with team/candidate names instead of positions / ids, multi-seat
+  teams get list of candidate names (None ~ nobody) in the seat order
+  '''
+  ret_val = [ ];
+  lseat = get_seat_teams(in_data);
+  for i_d, i_ch in get_result_items(in_results):
+    int_dict = { };
+    for indx in xrange(len(i_ch)):
+      t = in_data['teams'][lseat[indx]];
+      c = None;
+      if (i_ch[indx] != None):
+        c = in_data['candidates'][i_ch[indx]].name;
+      if (t.capacity > 1):
+        int_dict.setdefault(t.name, [ ]).append(c);
+      elif (c != None):
+        int_dict[t.name] = c;
+    ret_val.append((i_d, int_dict));
+  return(ret_val);
+
+def results_from_names(in_data, in_results):
+  ret_val = [ ];
+  for i_d, i_dict in get_result_items(in_results):
+    ch = [ ];
+    for i_t in in_data['teams']:
+      lnames = i_dict.get(i_t.name, None);
+      if (not isinstance(lnames, list)):
+        lnames = [lnames] * i_t.capacity;
+      for i_n in lnames:
+        c = None;
+        if (i_n != None):
+          c = find_object(in_data, 'candidates', i_n).id;
+        ch.append(c);
+    ret_val.append((i_d, ch));
+  return(ret_val);
+
+def get_seat_teams(in_data):
+  # list of team indexes of the seats (rows of the solver choices)
+  ret_val = [ ];
+  for i_t in in_data['teams']:
+    ret_val.extend([i_t.id] * i_t.capacity);
+  return(ret_val);
+
+def get_option_key(in_option):
+  # sort key of seat option (nobody first, then candidate ids)
+  if (in_option == None):
+    return(-1);
+  return(in_option);
+
+def get_batch_cnt(in_total_cnt):
+  ret_val = 1;
+  
+  for i_b in [100000, 10000, 1000, 100, 10]:
+    if (in_total_cnt > 100 * i_b):
+      ret_val = i_b;
+      break;
+  return(ret_val);
+
+def get_fraction(in_part, in_total):
+  # in_part / in_total safe for long integers beyond float range
+  if (in_total <= 0):
+    return(1.0);
+  return(((in_part * 10000) // in_total) / 10000.0);
+
+# ShardedSolver worker process data (compiled problem, best option count)
+shard_worker_args = None;
+
+def _init_shard_worker(in_problem, in_best_option_cnt, in_stop_event):
+  # ShardedSolver worker process initialization
+  global shard_worker_args;
+  shard_worker_args = (in_problem, in_best_option_cnt, in_stop_event);
+
+def _solve_shard(in_shard):
+  # ShardedSolver worker - enumerate single shard, returns (results, stats),
+  # the best-so-far ones when the search got stopped
+  problem, best_option_cnt, stop_event = shard_worker_args;
+  solver = Solver(in_data = None, in_best_option_cnt = best_option_cnt);
+  solver.problem = problem;
+  solver.shard = in_shard;
+  solver.init();
+  i_loop = 0;
+  while ( (not stop_event.is_set()) and (solver.next()) ):
+    i_loop += 1;
+    if ( ((i_loop % 4096) == 0) and (stop_event.is_set()) ):
+      break;
+  return(solver.get_results(), solver.get_stats());
+
+def _solve_scenario(in_args):
+  # ScenarioBatch worker - solve single compiled scenario, returns
+  # (results, status list, evaluated count)
+  if (in_args == None):
+    return(None);
+  problem, best_option_cnt, engine, presolve, time_limit, max_evaluations = in_args;
+  solver = get_solver(None, best_option_cnt, engine, presolve);
+  solver.problem = problem;
+  solver.init();
+  lplacements = list(iter_placements(None, solver, time_limit, max_evaluations));
+  return([(i_p.dissapointment, i_p.choice) for i_p in lplacements],
+         [i_p.status for i_p in lplacements], solver.eval_cnt);
+
+def _init_serve_worker():
+  # SolveService helper process initialization
+  import signal;
+  signal.signal(signal.SIGINT, signal.SIG_IGN);
+
+def get_serve_address(in_addr):
+  # (host, port) of <host>:<port> address, socket path of unix:<path> or
+  # any other one
+  if (in_addr.startswith('unix:')):
+    return(in_addr[len('unix:'):]);
+  if (':' in in_addr):
+    host, port = in_addr.rsplit(':', 1);
+    if (port.isdigit()):
+      return((host, int(port)));
+  return(in_addr);
+
+def remove_socket(in_path):
+  # remove stale Unix socket in_path, any other file is kept
+  import stat;
+  if (not os.path.exists(in_path)):
+    return;
+  if (not stat.S_ISSOCK(os.stat(in_path).st_mode)):
+    raise Exception("%s exists and is not a socket!" % in_path);
+  os.remove(in_path);
+
+def _serve_solve(in_data, in_opts, in_queue):
+  # SolveService worker - put the placements into in_queue as found
+  try:
+    solver = get_solver(in_data, in_opts['solve_cnt'], in_opts['engine'], in_opts['presolve'],
+                        in_opts['reduce_placements_for_single_requirement'], 1,
+                        in_opts['scoring']);
+    solver.init();
+    for i_p in iter_placements(in_data, solver, in_opts['time_limit'],
+                               in_opts['max_evaluations']):
+      in_queue.put((i_p.rank, i_p.dissapointment, i_p.choice, i_p.status));
+    in_queue.put(('done', solver.eval_cnt));
+  except Exception, e:
+    in_queue.put(('error', str(e)));
+
+def solve_assignment(in_matrix):
+  '''
+  Hungarian method (O(n^2.m)) for a rectangular cost matrix with
+  len(in_matrix) <= len(in_matrix[0]), returns list of selected column
+  indexes (one per row) and the row and column potentials (duals)
+  '''
+  n = len(in_matrix);
+  m = len(in_matrix[0]);
+  inf = float('inf');
+  # row/column potentials, column->row assignment (1-based, 0 ~ free)
+  u = [0.0] * (n + 1);
+  v = [0.0] * (m + 1);
+  p = [0] * (m + 1);
+  way = [0] * (m + 1);
+  for i in xrange(1, n + 1):
+    p[0] = i;
+    j0 = 0;
+    minv = [inf] * (m + 1);
+    used = [False] * (m + 1);
+    while (True):
+      used[j0] = True;
+      i0 = p[j0];
+      row = in_matrix[i0 - 1];
+      delta = inf;
+      j1 = 0;
+      for j in xrange(1, m + 1):
+        if (not used[j]):
+          cur = row[j - 1] - u[i0] - v[j];
+          if (cur < minv[j]):
+            minv[j] = cur;
+            way[j] = j0;
+          if (minv[j] < delta):
+            delta = minv[j];
+            j1 = j;
+      for j in xrange(m + 1):
+        if (used[j]):
+          u[p[j]] += delta;
+          v[j] -= delta;
+        else:
+          minv[j] -= delta;
+      j0 = j1;
+      if (p[j0] == 0):
+        break;
+    # augmenting path
+    while (True):
+      j1 = way[j0];
+      p[j0] = p[j1];
+      j0 = j1;
+      if (j0 == 0):
+        break;
+
+  ret_val = [None] * n;
+  for j in xrange(1, m + 1):
+    if (p[j] != 0):
+      ret_val[p[j] - 1] = j - 1;
+  return(ret_val, u[1:], v[1:]);
+
+# import record kinds - fields, number of required fields, classes
+IMPORT_FIELDS = { 'T' : ['name', 'priority', 'nick', 'capacity'],
+                  'C' : ['name', 'nick'],
+                  'R' : ['team', 'candidate', 'priority'],
+                  'D' : ['team', 'candidate'],
+                  'P' : ['candidate', 'team', 'priority'] };
+IMPORT_FIELDS_REQUIRED = { 'T' : 2, 'C' : 1, 'R' : 3, 'D' : 2, 'P' : 3 };
+IMPORT_CLASSES = { 'T' : Team, 'C' : Candidate, 'R' : Requirement, 'D' : Decision,
+                   'P' : Preference };
+
+# solver engines (--engine)
+SOLVER_ENGINES = { 'bruteforce' : Solver,
+                   'assignment' : AssignmentSolver,
+                   'batch'      : BatchSolver,
+                   'bnb'        : BranchBoundSolver,
+                   'local'      : LocalSearchSolver,
+                   'stable'     : StableSolver };
+
+SCORING_MODELS = { 'default'       : ScoringModel,
+                   'empty-penalty' : EmptySeatPenaltyModel };
+
+
+def get_result_status(in_solver, in_complete):
+  '''
+  List of labels of in_solver results - 'optimal' when proved, otherwise
+  the gap against the lower bound of the best placement
+  '''
+  results = in_solver.get_results();
+  proved_cnt = in_solver.get_proved_cnt();
+  if ((in_complete) and (in_solver.exact)):
+    proved_cnt = len(results);
+  bound = None;
+  ret_val = [ ];
+  for indx in xrange(len(results)):
+    d = results[indx][0];
+    if (indx < proved_cnt):
+      ret_val.append("optimal");
+      continue;
+    if (bound == None):
+      bound = in_solver.get_lower_bound();
+    if (d <= bound):
+      # the results are sorted, all of them so far reach the bound
+      ret_val.append("optimal");
+    else:
+      ret_val.append("gap:%.1f (%.1f%%)" % (d - bound, 100.0 * (d - bound) / max(abs(d), 1e-9)));
+  return(ret_val);
+
+def new_data():
+  # empty configuration, filled in by add_objects() / import_data()
+  ret_val = { };
+  ret_val['teams'] = [ ];
+  ret_val['candidates'] = [ ];
+  ret_val['requirements'] = [ ];
+  ret_val['decisions'] = [ ];
+  ret_val['preferences'] = [ ];
+  return(ret_val);
+
+def get_solver(in_data, in_solve_cnt = 1, in_engine = 'assignment', in_presolve = True,
+               in_reduce_ena = False, in_workers = 1, in_scoring = None):
+  # solver of in_data configuration (not initialized yet), in_scoring is
+  # ScoringModel object or SCORING_MODELS name
+  if (isinstance(in_scoring, basestring)):
+    if (in_scoring not in SCORING_MODELS):
+      raise Exception("Unknown scoring model %s!" % in_scoring);
+    in_scoring = SCORING_MODELS[in_scoring]();
+  if (in_engine not in SOLVER_ENGINES):
+    raise Exception("Unknown solver engine %s!" % in_engine);
+  engine = SOLVER_ENGINES[in_engine];
+  if (in_workers > 1):
+    if (in_engine != 'bruteforce'):
+      raise Exception("Multiple workers are supported by bruteforce engine only");
+    def engine(in_data, in_best_option_cnt):
+      return(ShardedSolver(in_data = in_data, in_best_option_cnt = in_best_option_cnt,
+                           in_workers = in_workers));
+  if ((in_presolve == True) and (SOLVER_ENGINES[in_engine].presolve)):
+    ret_val = PresolveSolver(in_data = in_data, in_best_option_cnt = in_solve_cnt,
+                             in_engine = engine);
+  else:
+    ret_val = engine(in_data = in_data, in_best_option_cnt = in_solve_cnt);
+  
+  # reduce choices for single requirement candidate <-> a team
+  if (in_reduce_ena == True):
+    ret_val.reduce_choices_4_single_req_ena = True;
+  ret_val.scoring = in_scoring;
+  return(ret_val);
+
+def iter_placements(in_data, in_solver, in_time_limit = None, in_max_evaluations = None,
+                    in_progress = None):
+  '''
+  Generator of the ranked Placement objects of in_solver (initialized) search
+
+  Placements proved while searching (the ranked assignment engine) are
+  yielded in the result store order once no tie can replace them, the rest
+  once the search is done or its budget exhausted. The search is stopped when the caller stops consuming.
+  in_progress - callable(in_solver) called every batch of search steps
+  '''
+  t = time.time();
+  deadline = None;
+  if (in_time_limit != None):
+    deadline = t + in_time_limit;
+  complete = False;
+  yielded_cnt = 0;
+  i_loop = 0;
+  i_batch_cnt = get_batch_cnt(in_solver.get_space_size());
+  try:
+    while (in_solver.next()):
+      if ( (in_progress != None) and ((i_loop % i_batch_cnt) == 0) ):
+        in_progress(in_solver);
+      i_loop += 1;
+      if (in_solver.get_proved_cnt() > yielded_cnt):
+        # proved results are the final leading ones of the store
+        results = in_solver.get_results();
+        while (yielded_cnt < in_solver.get_proved_cnt()):
+          i_d, i_ch = results[yielded_cnt];
+          yielded_cnt += 1;
+          yield Placement(in_data, yielded_cnt, i_d, i_ch, "optimal");
+      if ( ((in_max_evaluations != None) and (in_solver.eval_cnt >= in_max_evaluations)) or \
+           ((deadline != None) and (time.time() >= deadline)) ):
+        # budget exhausted - keep the best-so-far results
+        break;
+    else:
+      complete = True;
+  finally:
+    if ((not complete) and (not in_solver.stopped)):
+      in_solver.stop();
+  results = in_solver.get_results();
+  lstatus = get_result_status(in_solver, complete);
+  for indx in xrange(yielded_cnt, len(results)):
+    i_d, i_ch = results[indx];
+    yield Placement(in_data, indx + 1, i_d, i_ch, lstatus[indx]);
+
+def solve(in_data, in_solve_cnt = 1, in_engine = 'assignment', in_presolve = None,
+          in_reduce_ena = False, in_workers = 1, in_time_limit = None, in_max_evaluations = None,
+          in_scoring = None):
+  '''
+  Library API - generator of the in_solve_cnt best placements (Placement
+  objects starting from the best one) of in_data configuration, e.g.
+
+    data = new_data();
+    add_objects(data, [Team("tA~1"), Team("tB~2")], [Candidate("Alice")],
+                [Requirement("tA~Alice~1"), Requirement("tB~Alice~1")], [ ]);
+    for p in solve(data, 3):
+      print p.rank, p.dissapointment, p.get_names();
+
+  The assignment engine ranks the placements one by one, each of them is
+  yielded as soon as found, so the rest is never searched when the caller
+  stops early. The other engines search the whole space (or until the
+  budget is exhausted) first. Presolve is on by default for the engines
+  other than assignment (its components are merged at the end only).
+  in_scoring - ScoringModel object or SCORING_MODELS name (def: default)
+  '''
+  if (in_presolve == None):
+    in_presolve = (in_engine != 'assignment');
+  solver = get_solver(in_data, in_solve_cnt, in_engine, in_presolve, in_reduce_ena, in_workers,
+                      in_scoring);
+  solver.init();
+  for i_p in iter_placements(in_data, solver, in_time_limit, in_max_evaluations):
+    yield i_p;
+
+def print_scenarios(in_data, in_lout):
+  # comparison table of the best placement per scenario
+  print "Scenarios (best dissapointment, change against base):";
+  print "  %-24s %14s %10s  %s" % ("scenario", "dissapointment", "change", "placement");
+  base = None;
+  if (in_lout[0][1]):
+    base = in_lout[0][1][0][0];
+  for i_name, i_results, i_lstatus, i_eval_cnt in in_lout:
+    if (i_results == None):
+      print "  %-24s error: %s" % (i_name, i_lstatus[0]);
+    elif (len(i_results) == 0):
+      print "  %-24s %14s %10s  no valid placement" % (i_name, "-", "-");
+    else:
+      p = Placement(in_data, 1, i_results[0][0], i_results[0][1], i_lstatus[0]);
+      change = "-";
+      if ((base != None) and (i_name != "base")):
+        change = "%+.1f" % (p.dissapointment - base);
+      status = "";
+      if (p.status != "optimal"):
+        status = " (%s)" % p.status;
+      print "  %-24s %14.1f %10s  %s%s" % (i_name, p.dissapointment, change,
+                                          p.get_summary(), status);
+
+def run_scenarios(in_data, in_opts):
+  # command line what-if scenario batch
+  print "Scenario batch started:";
+  t = time.time();
+  batch = ScenarioBatch(in_data, in_opts['reduce_placements_for_single_requirement'],
+                        SCORING_MODELS[in_opts['scoring']]());
+  batch.load(in_opts['scenarios']);
+  lout = batch.run(in_opts['solve_cnt'], in_opts['engine'], in_opts['presolve'],
+                   in_opts['workers'], in_opts['time_limit'], in_opts['max_evaluations']);
+  print "  %d scenarios solved in %.1f s, %d placements evaluated" % \
+    (len(lout), time.time() - t, sum([i_o[3] for i_o in lout]));
+  print_scenarios(in_data, lout);
+
+def print_progress(in_solver):
+  print "  %.1f%% of search completed\r" % (100.0 * in_solver.get_progress()),
+
+def run_solver(in_data, in_opts):
+  '''
+  Command line solver part over the iter_placements() API, returns the
+  results and list of their status labels
+  '''
+  solver = get_solver(in_data, in_opts['solve_cnt'], in_opts['engine'], in_opts['presolve'],
+                      in_opts['reduce_placements_for_single_requirement'], in_opts['workers'],
+                      in_opts['scoring']);
+  
+  profile = None;
+  if (in_opts['profile'] == True):
+    profile = Profile();
+    profile.wrap(solver, 'init');
+  t = time.time();
+  solver.init();
+  if (profile != None):
+    profile.attach(solver);
+  if ( (isinstance(solver, PresolveSolver)) and \
+       ((solver.dominated_cnt + solver.forced_cnt > 0) or (len(solver.components) > 1)) ):
+    print "  presolve: %d unrequested and %d interchangeable candidates dropped, %d teams forced, %d components" % \
+      (solver.unrequested_cnt, solver.dominated_cnt, solver.forced_cnt, len(solver.components));
+  print "  %d placements in search space" % solver.get_space_size();
+  
+  # find the N best choices
+  lplacements = list(iter_placements(in_data, solver, in_opts['time_limit'],
+                                     in_opts['max_evaluations'], print_progress));
+  print "  %d placements evaluated                   " % solver.eval_cnt;
+  if (solver.stopped):
+    print "  search stopped after %.1f s, best-so-far result[s]" % (time.time() - t);
+  
+  if (profile != None):
+    profile.collect(solver, time.time() - t);
+    profile.print_report();
+    if (in_opts['profile_json'] != None):
+      profile.save_report(in_opts['profile_json']);
+  
+  return([(i_p.dissapointment, i_p.choice) for i_p in lplacements],
+         [i_p.status for i_p in lplacements]);
+
+
+# main() definition
+# ---------------------------------------------------------------------------
+def main(in_opts):
+  
+  # solve service
+  # -------------------------------------------------------------------------
+  if (in_opts['serve'] != None):
+    SolveService(in_opts).serve(in_opts['serve']);
+    return;
+  
+  # data storage
   # -------------------------------------------------------------------------
+  data = new_data();
+  
+  # load configuration
+  if (in_opts['load_data'] != None):
+    data = load_data(in_opts['load_data']);
+  
+  # import teams, candidates, requirements and decisions from files
+  for i_f in in_opts['import_data']:
+    import_data(data, i_f);
+  
+  # fill in the teams, candidates, requirements and decisions (appended to
+  # the loaded configuration if any)
+  add_objects(data, [Team(i_t) for i_t in in_opts['add_team']],
+              [Candidate(i_c) for i_c in in_opts['add_candidate']],
+              [Requirement(i_r) for i_r in in_opts['add_requirement']],
+              [Decision(i_d) for i_d in in_opts['add_decision']],
+              [Preference(i_p) for i_p in in_opts['add_preference']]);
+  
+  # stored results have to match the current configuration
+  fingerprint = get_fingerprint(data);
+  if ( ('results' in data) and ('fingerprint' in data) and \
+       (data['fingerprint'] != fingerprint) ):
+    print "Stored results do not match the configuration, dropped";
+    del data['results'];
+  data['fingerprint'] = fingerprint;
+  
+  # object listing
+  # -------------------------------------------------------------------------
+  print_listing(data, in_opts);
+  
+  # solver part
+  # -------------------------------------------------------------------------
+  results = None;
+  lstatus = None;
+  if (in_opts['solve'] == True):
+    
+    print "Solver part started:"
+    cache = None;
+    cache_key = None;
+    if (in_opts['cache_dir'] != None):
+      cache = SolutionCache(in_opts['cache_dir'], in_opts['cache_size'] * 1024 * 1024);
+      lextra = [in_opts['engine'], in_opts['solve_cnt'],
+                in_opts['reduce_placements_for_single_requirement']];
+      if (in_opts['scoring'] != 'default'):
+        lextra.append(SCORING_MODELS[in_opts['scoring']]().get_key());
+      cache_key = get_fingerprint(data, lextra);
+      results = cache.get(cache_key);
+      if (results != None):
+        results = results_from_names(data, results);
+        # only proved results get cached
+        lstatus = ["optimal"] * len(results);
+        print "  results found in cache %s" % cache.get_path(cache_key);
+    
+    if (results == None):
+      results, lstatus = run_solver(data, in_opts);
+      if ((cache != None) and (lstatus.count("optimal") == len(lstatus))):
+        cache.put(cache_key, results_to_names(data, results));
+    
+    # store results (allow to be serialized)
+    data['results'] = results;
+    ###print results;
+  else:
+    if ('results' in data):
+      results = data['results'];
+  
+  # save configuration/data
+  # -------------------------------------------------------------------------
+  if (in_opts['save_data'] != None):
+    save_data(data, in_opts['save_data']);
+  
+  # result presentation
+  # -------------------------------------------------------------------------
+  print_results(data, results, lstatus);
+  if ( (in_opts['explain'] == True) and (results != None) and (len(results) > 0) ):
+    choice = get_result_items(results)[0][1];
+    problem = Problem(data, in_opts['reduce_placements_for_single_requirement'],
+                      in_model = SCORING_MODELS[in_opts['scoring']]());
+    if (not problem.has_choice(choice)):
+      # loaded results solved with the other --reduce-placements-for-single-requirement
+      problem = Problem(data, not in_opts['reduce_placements_for_single_requirement'],
+                        in_model = SCORING_MODELS[in_opts['scoring']]());
+    if (problem.has_choice(choice)):
+      print_explanation(data, problem, choice);
+    else:
+      print "Explanation not available, the stored placement does not fit the configuration options";
+  
+  # what-if scenarios
+  # -------------------------------------------------------------------------
+  if (in_opts['scenarios'] != None):
+    run_scenarios(data, in_opts);
+  
+  # negotiation session
+  # -------------------------------------------------------------------------
+  if (in_opts['session'] == True):
+    session = Session(data, in_best_option_cnt = in_opts['solve_cnt'],
+                      in_reduce_ena = in_opts['reduce_placements_for_single_requirement'],
+                      in_scoring = SCORING_MODELS[in_opts['scoring']]());
+    session.run(sys.stdin);
+    
+    ###print in_opts;
+    ###print data;
+    ###print results;
+
+
+
+# command line
+# ---------------------------------------------------------------------------
+
+# options of the listing fast path (see get_listing_config())
+LISTING_OPTIONS = { '--list-teams' : 'list_teams', '--list-candidates' : 'list_candidates',
+                    '--list-requirements' : 'list_requirements',
+                    '--list-decisions' : 'list_decisions', '--list-all' : 'list_all',
+                    '-L' : 'list_all' };
+
+def get_option_parser():
+  import optparse;
   usage_msg = "usage: %prog [options]";
   op = optparse.OptionParser(usage=usage_msg);
 
@@ -599,7 +4296,7 @@ if __name__ == "__main__":
   # -------------------------------------------------------------------------
   op.add_option("-T", "--add-team", dest="add_team",
                 action="append", default=[],
-                help="Append new team/position syntax: <team-name>~<team-priority>[~<team-nick>]");
+                help="Append new team/position syntax: <team-name>~<team-priority>[~<team-nick>[~<capacity>]]");
   op.add_option("-C", "--add-candidate", dest="add_candidate",
                 action="append", default=[],
                 help="Append new candidate syntax: <cand-name>[~<cand-nick>]");
@@ -609,6 +4306,13 @@ if __name__ == "__main__":
   op.add_option("-D", "--add-decision", dest="add_decision",
                 action="append", default=[],
                 help="Append new team-candidate decision: <team-name>~<cand-name>");
+  op.add_option("-P", "--add-preference", dest="add_preference",
+                action="append", default=[],
+                help="Append new candidate-team preference (for the stable engine): <cand-name>~<team-name>~<priority>");
+  
+  op.add_option("--import", dest="import_data",
+                action="append", default=[], metavar="FILE",
+                help="Import teams/candidates/requirements/decisions/preferences from CSV or JSON Lines (.jsonl) FILE, record syntax: <T|C|R|D|P>,<fields as in -T/-C/-R/-D/-P>");
   
   op.add_option("--load-data", dest="load_data", type="string",
                 action="store", default=None,
@@ -617,6 +4321,10 @@ if __name__ == "__main__":
                 action="store", default=None,
                 help="Save serialized configuration & solver data (def: %default)", metavar="CFN");
   
+  op.add_option("--convert-data", dest="convert_data", type="string",
+                action="store", nargs=2, default=None, metavar="SRL CFN",
+                help="Convert pickled configuration & solver data SRL into binary CFN and exit (def: %default)");
+  
   op.add_option("--list-teams", dest="list_teams",
                 action="store_true", default=False,
                 help="List all defined teams (def: %default)");
@@ -643,6 +4351,56 @@ if __name__ == "__main__":
   op.add_option("--solve-cnt", dest="solve_cnt", type="int",
                 action="store", default=1, metavar="N",
                 help="To search for N best candidates placements among teams (def: %default)");
+  op.add_option("--no-presolve", dest="presolve",
+                action="store_false", default=True,
+                help="Do not reduce the problem and split it into independent components before the search");
+  op.add_option("--engine", dest="engine", type="choice",
+                choices=sorted(SOLVER_ENGINES.keys()),
+                action="store", default="bruteforce",
+                help="Solver engine <%s> (def: %%default)" % "|".join(sorted(SOLVER_ENGINES.keys())));
+  op.add_option("--scoring", dest="scoring", type="choice",
+                choices=sorted(SCORING_MODELS.keys()),
+                action="store", default="default",
+                help="Scoring model of the dissapointment <%s> (def: %%default)" % "|".join(sorted(SCORING_MODELS.keys())));
+  op.add_option("--time-limit", dest="time_limit", type="float",
+                action="store", default=None, metavar="SEC",
+                help="Stop the search after SEC seconds with the best-so-far placements (def: %default)");
+  op.add_option("--max-evaluations", dest="max_evaluations", type="int",
+                action="store", default=None, metavar="N",
+                help="Stop the search after N evaluated placements with the best-so-far ones (def: %default)");
+  op.add_option("--workers", dest="workers", type="int",
+                action="store", default=1, metavar="N",
+                help="Split the bruteforce search (or --scenarios, --serve solves) among N processes (def: %default)");
+  
+  op.add_option("--explain", dest="explain",
+                action="store_true", default=False,
+                help="Explain the best placement: team dissapointment, regret and cost of the alternatives (def: %default)");
+  
+  op.add_option("--profile", dest="profile",
+                action="store_true", default=False,
+                help="Print search counters and time spent in the solver phases (def: %default)");
+  op.add_option("--profile-json", dest="profile_json", type="string",
+                action="store", default=None, metavar="FILE",
+                help="Write the --profile report as JSON into FILE (def: %default)");
+  
+  op.add_option("--cache-dir", dest="cache_dir", type="string",
+                action="store", default=None, metavar="DIR",
+                help="Reuse solver results cached in directory DIR (def: %default)");
+  op.add_option("--cache-size", dest="cache_size", type="int",
+                action="store", default=64, metavar="MB",
+                help="Cache directory size limit in MB (def: %default)");
+  
+  op.add_option("--scenarios", dest="scenarios", type="string",
+                action="store", default=None, metavar="FILE",
+                help="Solve what-if scenarios of FILE against the configuration, line syntax: <name>: <D|U|R|X> <arg>[; ...] (def: %default)");
+  
+  op.add_option("--serve", dest="serve", type="string",
+                action="store", default=None, metavar="ADDR",
+                help="Serve JSON Lines solve requests on ADDR (<host>:<port>, unix:<path> or other Unix socket path) until interrupted, solves run in --workers processes (def: %default)");
+  
+  op.add_option("--session", dest="session",
+                action="store_true", default=False,
+                help="Interactive session re-solving after each decision/requirement change (def: %default)");
   
   op.add_option("--help-long", dest="help_long",
                 action="store_true", default=False,
@@ -652,17 +4410,84 @@ if __name__ == "__main__":
                 action="store_true", default=False,
                 help="List all test plan/case/run attributes");
   
-  (opts, args) = op.parse_args();
+  return(op);
+
+def get_config(in_argv):
+  '''
+  Options of in_argv (without the program name) as dict of typed values
+  keyed by the option dest, the long help is printed and the process exits
+  '''
+  op = get_option_parser();
+  (opts, args) = op.parse_args(in_argv);
   
   if (opts.help_long):
     print __doc__;
     op.print_help();
     sys.exit(0);
   
-  int_opts = { };
-  int_opts = eval('%s' % opts);
+  ret_val = dict(vars(opts));
+  if (ret_val['profile_json'] != None):
+    ret_val['profile'] = True;
+  return(ret_val);
+
+def get_listing_config(in_argv):
+  '''
+  Config of a pure listing command (--load-data of a binary data file and
+  --list-* options only) parsed without the option parser, None for any
+  other command
+  '''
+  ret_val = { 'load_data' : None };
+  for i_k in LISTING_OPTIONS.values():
+    ret_val[i_k] = False;
+  indx = 0;
+  while (indx < len(in_argv)):
+    arg = in_argv[indx];
+    if (arg in LISTING_OPTIONS):
+      ret_val[LISTING_OPTIONS[arg]] = True;
+    elif ( (arg == '--load-data') and (indx + 1 < len(in_argv)) ):
+      indx += 1;
+      ret_val['load_data'] = in_argv[indx];
+    elif (arg.startswith('--load-data=')):
+      ret_val['load_data'] = arg[len('--load-data='):];
+    else:
+      return(None);
+    indx += 1;
+  if ( (ret_val['load_data'] == None) or \
+       (True not in [ret_val[i_k] for i_k in LISTING_OPTIONS.values()]) ):
+    return(None);
+  # pickled (older) configurations go the full way (fingerprint check)
+  if ( (not os.path.isfile(ret_val['load_data'])) or \
+       (not DataFile.is_datafile(ret_val['load_data'])) ):
+    return(None);
+  return(ret_val);
+
+def run(in_argv):
+  '''
+  Command line entry point (in_argv without the program name), returns the
+  exit status
+  '''
+  int_opts = get_listing_config(in_argv);
+  if (int_opts != None):
+    # fast path - the data file fingerprint was computed when saved
+    data = load_data(int_opts['load_data']);
+    print_listing(data, int_opts);
+    print_results(data, data.get('results', None));
+    return(0);
+  
+  int_opts = get_config(in_argv);
+  
+  if (int_opts['convert_data'] != None):
+    convert_data(*int_opts['convert_data']);
+    return(0);
   
   main(int_opts);
+  return(0);
+
+
+# main() call
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+  sys.exit(run(sys.argv[1:]));
 
 
 # ---------------------------------------------------------------------------